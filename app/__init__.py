@@ -2,11 +2,30 @@ import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from flask_socketio import SocketIO
 
+from .caching import Cache
 from .config import Config
+from .database import apply_sqlite_pragmas, engine_options, register_engine_events
+from .inbox import InboxSummaries
+from .message_writer import MessageWriter
+from .passwords import PasswordHasher
+from .scheduler import Scheduler
+from .search import LocationSearch
+from .snapshot import LocationSnapshot
+from .versioning import VersionedCache
 
 db = SQLAlchemy()
 migrate = Migrate()
+cache = Cache()
+location_search = LocationSearch()
+versioned_cache = VersionedCache()
+scheduler = Scheduler()
+socketio = SocketIO()
+message_writer = MessageWriter()
+inbox_summaries = InboxSummaries()
+location_snapshot = LocationSnapshot()
+password_hasher = PasswordHasher()
 
 
 def create_app(config_class=Config):
@@ -15,8 +34,26 @@ def create_app(config_class=Config):
 
     # Initialize extensions
     try:
+        register_engine_events()
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config)
         db.init_app(app)
+        with app.app_context():
+            apply_sqlite_pragmas(db.engine, app.config.get("SQLITE_PRAGMAS"))
         migrate.init_app(app, db)
+        cache.init_app(app)
+        location_search.init_app(app)
+        versioned_cache.init_app(app)
+        scheduler.init_app(app)
+        message_writer.init_app(app)
+        inbox_summaries.init_app(app)
+        location_snapshot.init_app(app)  # after versioned_cache, see app/snapshot.py
+        password_hasher.init_app(app)
+        socketio.init_app(
+            app,
+            async_mode=app.config["SOCKETIO_ASYNC_MODE"],
+            message_queue=app.config["SOCKETIO_MESSAGE_QUEUE"],
+            channel=app.config["SOCKETIO_CHANNEL"],
+        )
     except Exception as e:
         logging.error("Error initializing extensions: %s", e)
         raise
@@ -25,6 +62,15 @@ def create_app(config_class=Config):
     try:
         from .routes import bp as routes_bp
         app.register_blueprint(routes_bp)
+        from . import sockets  # registers the Socket.IO event handlers
+
+        from .reservations import expire_pending_bookings
+        scheduler.add_job("expire_pending_bookings", expire_pending_bookings,
+                          app.config["BOOKING_EXPIRY_INTERVAL"])
+
+        from .pricing import suggest_prices_command, update_price_suggestions
+        scheduler.add_job("update_price_suggestions", update_price_suggestions, app.config["PRICING_INTERVAL"])
+        app.cli.add_command(suggest_prices_command)
 
     except ImportError as e:
         logging.error("Error importing blueprints: %s", e)
@@ -0,0 +1,118 @@
+import re
+
+from sqlalchemy import func
+
+# Fixed amenity vocabulary. Each amenity owns one bit of Location.amenity_mask
+# (and Renter.amenity_mask); new amenities are appended with the next free bit,
+# existing bits must never be renumbered.
+AMENITIES = [
+    # (key, label, bit)
+    ("security", "Security", 1 << 0),
+    ("lighting", "Lighting", 1 << 1),
+    ("covered", "Covered", 1 << 2),
+    ("cctv", "CCTV", 1 << 3),
+    ("ev_charging", "EV charging", 1 << 4),
+    ("gated", "Gated", 1 << 5),
+    ("accessible", "Accessible", 1 << 6),
+    ("open_24h", "Open 24 hours", 1 << 7),
+]
+
+BITS = {key: bit for key, label, bit in AMENITIES}
+LABELS = {key: label for key, label, bit in AMENITIES}
+
+# Spellings found in the free-form amenity strings, normalized by _term()
+ALIASES = {
+    "security": "security", "security guard": "security", "guard": "security", "guarded": "security",
+    "lighting": "lighting", "lights": "lighting", "lit": "lighting", "well lit": "lighting",
+    "covered": "covered", "roof": "covered", "roofed": "covered", "indoor": "covered", "garage": "covered",
+    "cctv": "cctv", "camera": "cctv", "cameras": "cctv", "surveillance": "cctv",
+    "ev charging": "ev_charging", "ev charger": "ev_charging", "ev": "ev_charging", "charging": "ev_charging",
+    "gated": "gated", "gate": "gated",
+    "accessible": "accessible", "wheelchair access": "accessible", "disabled access": "accessible",
+    "open 24 hours": "open_24h", "24 hours": "open_24h", "24h": "open_24h", "24/7": "open_24h", "24x7": "open_24h",
+}
+
+_SEPARATORS = re.compile(r"[,;|\n]+")
+
+
+def _term(text):
+    return " ".join(re.sub(r"[_\-]+", " ", text).lower().split())
+
+
+def parse(text):
+    """Split a free-form amenity string into ``(mask, unknown_terms)``.
+
+    Terms are separated by commas (as ``renter_register`` joins them),
+    semicolons, pipes or newlines; anything outside the vocabulary is returned
+    as typed so it can still be shown.
+    """
+    mask, unknown = 0, []
+    for raw in _SEPARATORS.split(text or ""):
+        raw = raw.strip()
+        if not raw:
+            continue
+        key = ALIASES.get(_term(raw))
+        if key:
+            mask |= BITS[key]
+        elif raw.lower() not in (term.lower() for term in unknown):
+            unknown.append(raw)
+    return mask, unknown
+
+
+def keys(mask):
+    return [key for key, label, bit in AMENITIES if mask & bit]
+
+
+def labels(mask):
+    return [label for key, label, bit in AMENITIES if mask & bit]
+
+
+def normalize(text):
+    """Return ``(mask, display_text)`` for a free-form amenity string.
+
+    The display text lists known amenities by label in vocabulary order,
+    followed by any unrecognized terms, so nothing the user typed is lost.
+    """
+    mask, unknown = parse(text)
+    return mask, ", ".join(labels(mask) + unknown) or None
+
+
+def parse_filter(value):
+    """Mask for a ``?amenities=covered,security`` filter. Raises ``ValueError``
+    for keys outside the vocabulary."""
+    mask = 0
+    for key in filter(None, (part.strip() for part in value.split(","))):
+        if key not in BITS:
+            raise ValueError(f"unknown amenity {key!r}")
+        mask |= BITS[key]
+    return mask
+
+
+def has_all(model, mask):
+    """SQL filter for rows of ``model`` offering every amenity in ``mask``."""
+    from .models import LocationAmenity
+    required = keys(mask)
+    # The join table's (amenity, location_id) index finds the candidates, the
+    # mask check on the row confirms the remaining amenities
+    candidates = LocationAmenity.query.with_entities(LocationAmenity.location_id).filter(
+        LocationAmenity.amenity == required[0]
+    )
+    return model.id.in_(candidates.scalar_subquery()) & (model.amenity_mask.op("&")(mask) == mask)
+
+
+def facet_counts(location_ids):
+    """Per-amenity number of locations among ``location_ids`` (a subquery), in
+    one grouped scan of the join table."""
+    from .models import LocationAmenity
+    rows = LocationAmenity.query.with_entities(LocationAmenity.amenity, func.count()).filter(
+        LocationAmenity.location_id.in_(location_ids)
+    ).group_by(LocationAmenity.amenity)
+    return dict(rows.all())
+
+
+def facets(counts, mask=0):
+    # Facet list in vocabulary order, marking the amenities already filtered on
+    return [
+        {"key": key, "label": label, "count": counts.get(key, 0), "selected": bool(mask & bit)}
+        for key, label, bit in AMENITIES
+    ]
@@ -0,0 +1,65 @@
+from datetime import date
+
+from sqlalchemy import and_, exists
+
+from .models import AvailabilityBlock, Reservation
+
+# Longest date range a single query may ask about
+MAX_RANGE_DAYS = 366
+
+
+def parse_date_range(start, end=None):
+    """Parse ISO ``start`` and ``end`` dates (both inclusive, ``end`` defaults to
+    ``start``). Raises ``ValueError`` for a malformed, reversed or too long range.
+    """
+    start_date = date.fromisoformat(start)
+    end_date = date.fromisoformat(end) if end else start_date
+    if end_date < start_date:
+        raise ValueError("end is before start")
+    if (end_date - start_date).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"date range is longer than {MAX_RANGE_DAYS} days")
+    return start_date, end_date
+
+
+def booked(model, start, end):
+    # Any reservation in the range; a range scan of uq_reservation_location_date
+    return exists().where(Reservation.location_id == model.id, Reservation.date.between(start, end))
+
+
+def blocked(model, start, end):
+    # Any block overlapping the range, answered from ix_availability_block_location
+    return exists().where(
+        AvailabilityBlock.location_id == model.id,
+        AvailabilityBlock.start_date <= end,
+        AvailabilityBlock.end_date >= start,
+    )
+
+
+def free_between(model, start, end):
+    """SQL filter for rows of ``model`` with no booking or block from ``start`` to ``end``.
+
+    Both checks are correlated ``NOT EXISTS`` probes into per-location indexes,
+    so combined with a spatial filter only the nearby candidates are examined.
+    """
+    return and_(~booked(model, start, end), ~blocked(model, start, end))
+
+
+def calendar(location_id, start, end):
+    # Booked dates and blocked intervals of one location within the range
+    booked_dates = Reservation.query.with_entities(Reservation.date).filter(
+        Reservation.location_id == location_id, Reservation.date.between(start, end)
+    ).order_by(Reservation.date)
+    blocks = AvailabilityBlock.query.filter(
+        AvailabilityBlock.location_id == location_id,
+        AvailabilityBlock.start_date <= end,
+        AvailabilityBlock.end_date >= start,
+    ).order_by(AvailabilityBlock.start_date)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "booked": [day.isoformat() for day, in booked_dates],
+        "blocked": [
+            {"id": block.id, "start": block.start_date.isoformat(), "end": block.end_date.isoformat()}
+            for block in blocks
+        ],
+    }
@@ -0,0 +1,278 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+
+from flask import Response, current_app, has_app_context, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class NullBackend:
+    """Caches nothing; every lookup misses."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def get_counter(self, key):
+        return 0
+
+    def init_counter(self, key, value):
+        pass
+
+    def incr(self, key):
+        return 0
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryBackend:
+    """Process-local LRU with per-entry expiry.
+
+    Counters (the invalidation generations) are kept apart from the LRU so
+    they are never evicted.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_counter(self, key):
+        return self._counters.get(key)
+
+    def init_counter(self, key, value):
+        with self._lock:
+            self._counters.setdefault(key, value)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._counters.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+class RedisBackend:
+    """Backend for Redis or any server speaking its protocol; needs the ``redis`` package."""
+
+    def __init__(self, url, prefix=""):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND = 'redis' requires the redis package")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    # Counters are stored as plain integers so INCR can update them atomically
+    def get_counter(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else int(raw)
+
+    def init_counter(self, key, value):
+        self.client.set(self.prefix + key, value, nx=True)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+def _tags(models):
+    return tuple(sorted(model.__tablename__ for model in models))
+
+
+def _generation_key(table):
+    return f"generation:{table}"
+
+
+class Cache:
+    """Application cache with TTLs and invalidation by table.
+
+    Entries are stored under their key plus the current generation of every
+    table they depend on. Committing a change to a table bumps its generation,
+    so dependent entries are never read again and age out of the backend.
+    With the memory backend invalidation is per process; use the Redis backend
+    to share entries and invalidations between workers.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("CACHE_BACKEND", "memory")
+        app.config.setdefault("CACHE_DEFAULT_TTL", 300)
+        app.config.setdefault("CACHE_MAX_ENTRIES", 1024)
+        app.config.setdefault("CACHE_REDIS_URL", "redis://localhost:6379/0")
+        app.config.setdefault("CACHE_KEY_PREFIX", "jayga:")
+
+        backend = app.config["CACHE_BACKEND"]
+        if backend == "memory":
+            app.extensions["cache"] = MemoryBackend(app.config["CACHE_MAX_ENTRIES"])
+        elif backend == "redis":
+            app.extensions["cache"] = RedisBackend(app.config["CACHE_REDIS_URL"], app.config["CACHE_KEY_PREFIX"])
+        elif backend == "null":
+            app.extensions["cache"] = NullBackend()
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND {backend!r}")
+
+        for identifier, listener in (("after_flush", _collect_flushed_tables),
+                                     ("do_orm_execute", _collect_bulk_tables),
+                                     ("after_commit", _invalidate_committed_tables),
+                                     ("after_rollback", _discard_tables)):
+            if not event.contains(Session, identifier, listener):
+                event.listen(Session, identifier, listener)
+
+    @property
+    def backend(self):
+        return current_app.extensions["cache"]
+
+    def _versioned_key(self, key, tags):
+        generations = []
+        for table in tags:
+            generation = self.backend.get_counter(_generation_key(table))
+            if generation is None:
+                # Start from the clock so a lost counter never revives old entries
+                self.backend.init_counter(_generation_key(table), time.time_ns())
+                generation = self.backend.get_counter(_generation_key(table))
+            generations.append(f"{table}={generation}")
+        return "|".join([key] + generations)
+
+    def get(self, key, depends_on=()):
+        return self.backend.get(self._versioned_key(key, _tags(depends_on)))
+
+    def set(self, key, value, ttl=None, depends_on=()):
+        if ttl is None:
+            ttl = current_app.config["CACHE_DEFAULT_TTL"]
+        self.backend.set(self._versioned_key(key, _tags(depends_on)), value, ttl)
+
+    def invalidate(self, *tables):
+        invalidate_tables(self.backend, tables)
+
+    def memoize(self, ttl=None, depends_on=()):
+        """Cache a function's return value per arguments until ``ttl`` or a change to ``depends_on``.
+
+        Return plain data (dicts, lists, numbers), not ORM instances: cached
+        objects outlive the session that loaded them.
+        """
+        def decorator(func):
+            name = f"{func.__module__}.{func.__qualname__}"
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                key = f"memoize:{name}:{args!r}:{sorted(kwargs.items())!r}"
+                value = self.get(key, depends_on)
+                if value is None:
+                    value = func(*args, **kwargs)
+                    self.set(key, value, ttl, depends_on)
+                return value
+            return wrapper
+        return decorator
+
+    def cached_view(self, ttl=None, depends_on=(), per_user=True):
+        """Cache successful GET responses of a view, keyed by full path and (optionally) the session user."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method != "GET":
+                    return view(*args, **kwargs)
+
+                key = f"view:{request.full_path}"
+                if per_user:
+                    key += f":{session.get('user_type')}:{session.get('user_id')}"
+                cached = self.get(key, depends_on)
+                if cached is not None:
+                    body, mimetype = cached
+                    return Response(body, mimetype=mimetype)
+
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.set(key, (response.get_data(), response.mimetype), ttl, depends_on)
+                return response
+            return wrapper
+        return decorator
+
+
+def invalidate_tables(backend, tables):
+    for table in tables:
+        backend.incr(_generation_key(table))
+
+
+def _pending_tables(session):
+    return session.info.setdefault("cache_invalidate", set())
+
+
+def _collect_flushed_tables(session, flush_context):
+    tables = _pending_tables(session)
+    for obj in chain(session.new, session.deleted):
+        tables.add(obj.__table__.name)
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            tables.add(obj.__table__.name)
+
+
+def _collect_bulk_tables(orm_execute_state):
+    # Set-based INSERT/UPDATE/DELETE statements bypass the flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _pending_tables(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+
+
+def _invalidate_committed_tables(session):
+    tables = session.info.pop("cache_invalidate", None)
+    if tables and has_app_context() and "cache" in current_app.extensions:
+        invalidate_tables(current_app.extensions["cache"], tables)
+
+
+def _discard_tables(session):
+    session.info.pop("cache_invalidate", None)
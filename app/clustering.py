@@ -0,0 +1,167 @@
+import math
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import spatial
+
+# Available locations are aggregated into one grid per map zoom level. A level's
+# cells are CELL_PIXELS wide on screen at that zoom, so however many locations
+# there are, a viewport never holds more than about (width / CELL_PIXELS) x
+# (height / CELL_PIXELS) clusters. Past MAX_ZOOM the map shows single markers.
+MIN_ZOOM = 0
+MAX_ZOOM = 16
+TILE_PIXELS = 256
+CELL_PIXELS = 64
+
+
+def cell_size(zoom):
+    # Degrees per cell; one 256px map tile spans 360 / 2**zoom degrees of longitude
+    return 360.0 / (2 ** zoom) * CELL_PIXELS / TILE_PIXELS
+
+
+def _grid(zoom):
+    size = cell_size(zoom)
+    return size, int(round(180 / size)), int(round(360 / size))
+
+
+def cell_of(zoom, lat, lng):
+    size, rows, cols = _grid(zoom)
+    row = min(max(int(math.floor((lat + 90) / size)), 0), rows - 1)
+    col = min(max(int(math.floor((lng + 180) / size)), 0), cols - 1)
+    return row, col
+
+
+def cell_bbox(zoom, row, col):
+    size = cell_size(zoom)
+    return (row * size - 90, col * size - 180, (row + 1) * size - 90, (col + 1) * size - 180)
+
+
+def member(lat, lng, price, available):
+    # What a location contributes to the clusters, or None if it is not on the map
+    if not available or lat is None or lng is None:
+        return None
+    return float(lat), float(lng), float(price or 0)
+
+
+def _add(connection, zoom, row, col, lat, lng, price):
+    from .models import LocationCluster
+    table = LocationCluster.__table__
+    key = and_(table.c.level == zoom, table.c.row == row, table.c.col == col)
+    changed = update(table).where(key).values(
+        count=table.c.count + 1,
+        lat_sum=table.c.lat_sum + lat,
+        lng_sum=table.c.lng_sum + lng,
+        min_price=func.min(table.c.min_price, price) if connection.dialect.name == "sqlite"
+        else func.least(table.c.min_price, price),
+    )
+    if connection.execute(changed).rowcount:
+        return
+    try:
+        # A concurrent writer may create the same cell first; then count into its row
+        with connection.begin_nested():
+            connection.execute(insert(table).values(
+                level=zoom, row=row, col=col, count=1, lat_sum=lat, lng_sum=lng, min_price=price,
+            ))
+    except IntegrityError:
+        connection.execute(changed)
+
+
+def _remove(connection, zoom, row, col, lat, lng, price):
+    from .models import Location, LocationCluster
+    table = LocationCluster.__table__
+    key = and_(table.c.level == zoom, table.c.row == row, table.c.col == col)
+    connection.execute(update(table).where(key).values(
+        count=table.c.count - 1,
+        lat_sum=table.c.lat_sum - lat,
+        lng_sum=table.c.lng_sum - lng,
+    ))
+    connection.execute(delete(table).where(key, table.c.count <= 0))
+
+    # A minimum cannot be decremented: if this was the cheapest spot, look the
+    # new one up from the cell's locations through the geocell index
+    cheapest = select(func.min(Location.price)).where(
+        Location.available == True,  # noqa: E712
+        spatial.within_bbox(Location, *cell_bbox(zoom, row, col)),
+    ).scalar_subquery()
+    connection.execute(update(table).where(key, table.c.min_price >= price).values(min_price=cheapest))
+
+
+def apply_change(connection, old, new):
+    """Move a location's contribution from ``old`` to ``new`` on every level.
+
+    Both are ``member()`` tuples (or None) and the location row must already be
+    written, so the per-cell minimum can be recomputed from the table.
+    """
+    if old == new:
+        return
+    for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+        old_cell = cell_of(zoom, *old[:2]) if old else None
+        new_cell = cell_of(zoom, *new[:2]) if new else None
+        if old:
+            _remove(connection, zoom, *old_cell, *old)
+        if new:
+            _add(connection, zoom, *new_cell, *new)
+
+
+def rebuild(connection):
+    """Recompute every cluster from the location table, e.g. after bulk imports
+    or to reset floating point drift in the coordinate sums."""
+    from .models import Location, LocationCluster
+    cells = {}
+    rows = connection.execute(select(Location.lat, Location.lng, Location.price).where(Location.available == True))  # noqa: E712
+    for row in rows:
+        values = member(*row, True)
+        if values is None:
+            continue
+        lat, lng, price = values
+        for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+            cell = cells.setdefault((zoom,) + cell_of(zoom, lat, lng), [0, 0.0, 0.0, price])
+            cell[0] += 1
+            cell[1] += lat
+            cell[2] += lng
+            cell[3] = min(cell[3], price)
+
+    table = LocationCluster.__table__
+    connection.execute(delete(table))
+    if cells:
+        connection.execute(insert(table), [
+            {"level": zoom, "row": row, "col": col, "count": count,
+             "lat_sum": lat_sum, "lng_sum": lng_sum, "min_price": min_price}
+            for (zoom, row, col), (count, lat_sum, lng_sum, min_price) in cells.items()
+        ])
+    return len(cells)
+
+
+def clusters(south, west, north, east, zoom):
+    """Clusters of available locations inside the box at map ``zoom``.
+
+    Each is ``{"count", "lat", "lng", "min_price", "bbox"}`` with the centroid
+    of its locations and the bounds of its grid cell; zooming the map to the
+    cell's bounds splits a cluster into the next level's.
+    """
+    from .models import LocationCluster
+    zoom = min(max(int(zoom), MIN_ZOOM), MAX_ZOOM)
+    first_row, first_col = cell_of(zoom, south, west)
+    last_row, last_col = cell_of(zoom, north, east)
+    if west > east:
+        # Box crosses the antimeridian
+        cols = or_(LocationCluster.col >= first_col, LocationCluster.col <= last_col)
+    else:
+        cols = LocationCluster.col.between(first_col, last_col)
+
+    query = LocationCluster.query.filter(
+        LocationCluster.level == zoom,
+        LocationCluster.row.between(first_row, last_row),
+        cols,
+    ).order_by(LocationCluster.row, LocationCluster.col)
+    return [
+        {
+            "count": cell.count,
+            "lat": cell.lat_sum / cell.count,
+            "lng": cell.lng_sum / cell.count,
+            "min_price": cell.min_price,
+            "bbox": list(cell_bbox(zoom, cell.row, cell.col)),
+        }
+        for cell in query
+    ]
@@ -12,5 +12,76 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY') or 'default-secret-key'
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI') or 'sqlite:///' + os.path.join(basedir, 'site.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Database profile: sqlite or postgres, picks the connection pool defaults
+    # (see app/database.py); the DB_* settings override single values
+    DATABASE_PROFILE = os.getenv('DATABASE_PROFILE') or 'sqlite'
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE')) if os.getenv('DB_POOL_SIZE') else None
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW')) if os.getenv('DB_MAX_OVERFLOW') else None
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '').lower() in ('1', 'true') if os.getenv('DB_POOL_PRE_PING') else None
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE')) if os.getenv('DB_POOL_RECYCLE') else None
+    # Applied to every new SQLite connection: WAL so readers never wait for the
+    # writer, a busy timeout instead of immediate "database is locked" errors,
+    # and larger page / mmap caches (cache_size is in KiB when negative)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -20000,
+    }
     UPLOAD_FOLDER = os.path.join(basedir, 'static', 'uploads')
-    GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY') or 'your-google-maps-api-key'
\ No newline at end of file
+    GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY') or 'your-google-maps-api-key'
+    # Location search: auto, sqlite_fts, postgres or like
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND') or 'auto'
+    SEARCH_PER_PAGE = 20
+    # Rows per page for keyset-paginated listings
+    PAGE_SIZE = 50
+    # Most bookings a single batch status update may name
+    BOOKING_BATCH_MAX = 1000
+    # Rows fetched per round trip (and encoded per chunk) by streaming responses
+    STREAM_BATCH_SIZE = 500
+    # Application cache: memory (per process), redis or null
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND') or 'memory'
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL') or 'redis://localhost:6379/0'
+    CACHE_DEFAULT_TTL = 300
+    CACHE_MAX_ENTRIES = 1024
+    # Password hashing (app/passwords.py): any werkzeug method with its cost, e.g.
+    # pbkdf2:sha256:600000 or scrypt:32768:8:1; older hashes are upgraded at login
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    PASSWORD_SALT_LENGTH = 16
+    # Hashing threads (default: one per CPU) and how many hashes may be queued or
+    # running before logins wait up to PASSWORD_HASH_QUEUE_TIMEOUT seconds and fail
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS')) if os.getenv('PASSWORD_HASH_WORKERS') else None
+    PASSWORD_HASH_MAX_PENDING = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT = 2.0
+    # Suggested prices (app/pricing.py): bookings dated within the window around
+    # today set each area's demand, weighted down by half every HALF_LIFE days
+    PRICING_INTERVAL = 86400  # seconds between scheduled recomputations
+    PRICING_LOOKBACK_DAYS = 28
+    PRICING_LOOKAHEAD_DAYS = 28
+    PRICING_HALF_LIFE_DAYS = 7
+    PRICING_AREA_ZOOM = 12  # areas are the map cluster cells at this zoom, about 5 km wide
+    PRICING_DEMAND_WEIGHT = 0.3
+    PRICING_OCCUPANCY_WEIGHT = 0.5  # applied to a spot's occupancy minus its area's average
+    PRICING_MIN_MULTIPLIER = 0.7  # bounds of the final multiplier, place type factor included
+    PRICING_MAX_MULTIPLIER = 1.5
+    PRICING_PLACE_TYPE_FACTORS = {'residential': 1.0, 'commercial': 1.15}
+    # Serve location searches without dates from an in-memory columnar copy (app/snapshot.py)
+    LOCATION_SNAPSHOT = os.getenv('LOCATION_SNAPSHOT', 'true').lower() not in ('0', 'false')
+    # Background jobs: job state in the database (shared by workers) or memory
+    SCHEDULER_JOBSTORE = os.getenv('SCHEDULER_JOBSTORE') or 'database'
+    SCHEDULER_TICK = 30  # seconds between checks for due jobs
+    BOOKING_EXPIRY_INTERVAL = 3600  # seconds between sweeps of past pending bookings
+    # Socket.IO: async mode eventlet, gevent or threading (None picks the first
+    # installed). A message queue URL (e.g. redis://localhost:6379/1, or any
+    # kombu URL such as amqp://) lets several worker processes share rooms
+    SOCKETIO_ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE') or None
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+    SOCKETIO_CHANNEL = os.getenv('SOCKETIO_CHANNEL') or 'jayga-socketio'
+    # Chat messages are saved in batches of up to this many rows, at most
+    # FLUSH_INTERVAL seconds after they are sent; senders wait up to
+    # PUT_TIMEOUT seconds for room when MAX_QUEUE messages are already waiting
+    MESSAGE_WRITER_BATCH_SIZE = 200
+    MESSAGE_WRITER_FLUSH_INTERVAL = 0.25
+    MESSAGE_WRITER_MAX_QUEUE = 10000
+    MESSAGE_WRITER_PUT_TIMEOUT = 1.0
@@ -0,0 +1,74 @@
+import sqlite3
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+# Engine defaults per DATABASE_PROFILE; DB_* settings and SQLALCHEMY_ENGINE_OPTIONS override them
+PROFILES = {
+    # One writer at a time, so a small pool; WAL lets readers run alongside it
+    "sqlite": {"pool_size": 5, "max_overflow": 10, "pool_pre_ping": False, "pool_recycle": -1},
+    # Check and recycle connections that the server or a proxy may have dropped
+    "postgres": {"pool_size": 10, "max_overflow": 20, "pool_pre_ping": True, "pool_recycle": 1800},
+}
+
+POOL_SETTINGS = {
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_pre_ping": "DB_POOL_PRE_PING",
+    "pool_recycle": "DB_POOL_RECYCLE",
+}
+
+
+def engine_options(config):
+    """``SQLALCHEMY_ENGINE_OPTIONS`` for the configured profile and overrides."""
+    profile = config["DATABASE_PROFILE"]
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DATABASE_PROFILE {profile!r}")
+    options = dict(PROFILES[profile])
+    for option, setting in POOL_SETTINGS.items():
+        if config.get(setting) is not None:
+            options[option] = config[setting]
+
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # An in-memory database lives in its single shared connection
+        for option in POOL_SETTINGS:
+            options.pop(option, None)
+
+    options.update(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    return options
+
+
+def _sqlite_connect(dbapi_connection, connection_record):
+    # pysqlite only opens a transaction before DML, and a SAVEPOINT issued
+    # outside one starts (and its RELEASE commits) a transaction of its own.
+    # Turn that off and let SQLAlchemy emit BEGIN, so savepoints nest properly
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.isolation_level = None
+
+
+def _sqlite_begin(connection):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("BEGIN")
+
+
+def register_engine_events():
+    for identifier, listener in (("connect", _sqlite_connect), ("begin", _sqlite_begin)):
+        if not event.contains(Engine, identifier, listener):
+            event.listen(Engine, identifier, listener)
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run ``PRAGMA name = value`` for each of ``pragmas`` on every new connection of ``engine``."""
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+    event.listen(engine, "connect", set_pragmas)
@@ -0,0 +1,167 @@
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import case, event, insert, or_, select, tuple_, update
+from sqlalchemy.orm import Session
+
+PREVIEW_LENGTH = 200
+
+
+def user_room(user_type, user_id):
+    # Socket.IO room of every connection of one user
+    return f"user_{user_type}_{user_id}"
+
+
+def serialize_summary(row):
+    return {
+        "booking_id": row.booking_id,
+        "unread_count": row.unread_count,
+        "last_message_at": row.last_message_at.isoformat() if row.last_message_at else None,
+        "last_message_preview": row.last_message_preview,
+        "last_sender_type": row.last_sender_type,
+    }
+
+
+def _deltas(rows):
+    # Fold messages into one change per (user_type, user_id, booking_id): the
+    # receiver gains an unread message, and both sides get the latest message
+    deltas = {}
+    for row in rows:
+        timestamp = row.get("timestamp") or datetime.utcnow()
+        booking_id = int(row["booking_id"])
+        for user_type, user_id, unread in (
+            (row["receiver_type"], row["receiver_id"], 0 if row.get("read_status") else 1),
+            (row["sender_type"], row["sender_id"], 0),
+        ):
+            delta = deltas.setdefault((user_type, int(user_id), booking_id), {"unread": 0, "last": None})
+            delta["unread"] += unread
+            if delta["last"] is None or timestamp >= delta["last"][0]:
+                delta["last"] = (timestamp, (row["message_content"] or "")[:PREVIEW_LENGTH], row["sender_type"])
+    return deltas
+
+
+def _key_filter(table, key):
+    user_type, user_id, booking_id = key
+    return (table.c.user_type == user_type) & (table.c.user_id == user_id) & (table.c.booking_id == booking_id)
+
+
+def _stash(session, connection, keys):
+    # Read back the changed rows so they can be pushed to the users once committed
+    from .models import InboxSummary
+    table = InboxSummary.__table__
+    rows = connection.execute(
+        select(table).where(tuple_(table.c.user_type, table.c.user_id, table.c.booking_id).in_(list(keys)))
+    )
+    updates = session.info.setdefault("inbox_updates", {})
+    for row in rows:
+        updates[(row.user_type, row.user_id, row.booking_id)] = serialize_summary(row)
+
+
+def record_messages(session, rows):
+    """Apply new messages (dicts of Message columns) to the inbox summaries.
+
+    Runs in the transaction inserting the messages: one UPDATE (or INSERT, for
+    a user's first message on a booking) per user and booking, however many
+    messages are in the batch.
+    """
+    from .models import InboxSummary
+    table = InboxSummary.__table__
+    connection = session.connection()
+    deltas = _deltas(rows)
+    for key, delta in deltas.items():
+        timestamp, preview, sender_type = delta["last"]
+        newer = or_(table.c.last_message_at.is_(None), table.c.last_message_at <= timestamp)
+        result = connection.execute(
+            update(table).where(_key_filter(table, key)).values(
+                unread_count=table.c.unread_count + delta["unread"],
+                last_message_at=case((newer, timestamp), else_=table.c.last_message_at),
+                last_message_preview=case((newer, preview), else_=table.c.last_message_preview),
+                last_sender_type=case((newer, sender_type), else_=table.c.last_sender_type),
+            )
+        )
+        if result.rowcount == 0:
+            user_type, user_id, booking_id = key
+            connection.execute(insert(table).values(
+                user_type=user_type, user_id=user_id, booking_id=booking_id, unread_count=delta["unread"],
+                last_message_at=timestamp, last_message_preview=preview, last_sender_type=sender_type,
+            ))
+    if deltas:
+        _stash(session, connection, deltas.keys())
+
+
+def mark_read(user_type, user_id, booking_id):
+    """Mark the user's messages on a booking as read; a no-op (one indexed
+    lookup) when nothing is unread. Commit is left to the caller.
+    """
+    from . import db
+    from .models import InboxSummary, Message
+    summary = db.session.get(InboxSummary, (user_type, user_id, booking_id))
+    if summary is None or summary.unread_count == 0:
+        return
+    db.session.execute(
+        update(Message).where(
+            Message.booking_id == booking_id,
+            Message.receiver_type == user_type,
+            Message.receiver_id == user_id,
+            Message.read_status == False,
+        ).values(read_status=True).execution_options(synchronize_session=False)
+    )
+    summary.unread_count = 0
+    db.session.flush()
+    _stash(db.session, db.session.connection(), [(user_type, user_id, booking_id)])
+
+
+def _message_columns(message):
+    return {column.key: getattr(message, column.key) for column in message.__table__.columns}
+
+
+def _record_flushed_messages(session, flush_context):
+    from .models import Message
+    rows = [_message_columns(obj) for obj in session.new if isinstance(obj, Message)]
+    if rows:
+        record_messages(session, rows)
+
+
+def _record_bulk_messages(orm_execute_state):
+    # Bulk INSERTs (e.g. the batched chat writer) bypass the flush
+    from .models import Message
+    if orm_execute_state.is_insert and orm_execute_state.statement.table.name == Message.__tablename__:
+        parameters = orm_execute_state.parameters
+        rows = parameters if isinstance(parameters, list) else [parameters]
+        record_messages(orm_execute_state.session, rows)
+
+
+def _push_committed_updates(session):
+    updates = session.info.pop("inbox_updates", None)
+    if not updates or not has_app_context() or "inbox_summaries" not in current_app.extensions:
+        return
+    from . import socketio
+    for (user_type, user_id, booking_id), payload in updates.items():
+        socketio.emit("inbox_update", payload, to=user_room(user_type, user_id))
+
+
+def _discard_updates(session):
+    session.info.pop("inbox_updates", None)
+
+
+class InboxSummaries:
+    """Keeps ``InboxSummary`` in step with the message table.
+
+    Counts and latest messages are updated in the same transaction as the
+    messages themselves, so inbox badges read one row instead of counting
+    messages. Committed changes are pushed to the user's Socket.IO room as
+    ``inbox_update`` events.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["inbox_summaries"] = True
+        for identifier, listener in (("after_flush", _record_flushed_messages),
+                                     ("do_orm_execute", _record_bulk_messages),
+                                     ("after_commit", _push_committed_updates),
+                                     ("after_rollback", _discard_updates)):
+            if not event.contains(Session, identifier, listener):
+                event.listen(Session, identifier, listener)
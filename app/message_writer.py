@@ -0,0 +1,165 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+log = logging.getLogger(__name__)
+
+
+class WriterFull(RuntimeError):
+    pass
+
+
+def _missing_fields(row):
+    # NOT NULL columns of Message the row leaves empty; checked on submit, since
+    # the writer thread could only log and drop such a row long after the sender moved on
+    from .models import Message
+    return [column.name for column in Message.__table__.columns
+            if not column.nullable and not column.primary_key and column.default is None
+            and row.get(column.name) is None]
+
+
+class _Writer:
+    """The queue and flushing thread of one app."""
+
+    def __init__(self, app):
+        self.app = app
+        self.batch_size = app.config["MESSAGE_WRITER_BATCH_SIZE"]
+        self.flush_interval = app.config["MESSAGE_WRITER_FLUSH_INTERVAL"]
+        self.put_timeout = app.config["MESSAGE_WRITER_PUT_TIMEOUT"]
+        self.retries = app.config["MESSAGE_WRITER_RETRIES"]
+        self.queue = queue.Queue(app.config["MESSAGE_WRITER_MAX_QUEUE"])
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, row):
+        missing = _missing_fields(row)
+        if missing:
+            raise ValueError(f"Message is missing {', '.join(missing)}")
+        if self._closed.is_set():
+            raise WriterFull("The message writer has shut down")
+        self._ensure_thread()
+        try:
+            # A full queue holds the sender back for a moment before refusing
+            self.queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            raise WriterFull("Too many messages are waiting to be saved")
+
+    def flush(self):
+        # Block until everything queued so far is in the database
+        if self._thread is not None:
+            self.queue.join()
+
+    def close(self, timeout=None):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            elif self._closed.is_set():
+                return
+
+    def _next_batch(self):
+        # Wait for one row, then gather more until the batch is full or the
+        # window ends; on shutdown take only what is already queued
+        closing = self._closed.is_set()
+        try:
+            batch = [self.queue.get_nowait() if closing else self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                if closing:
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        from . import db
+        from .models import Message
+        with self.app.app_context():
+            try:
+                for attempt in range(self.retries + 1):
+                    try:
+                        db.session.execute(insert(Message), batch)
+                        db.session.commit()
+                        return
+                    except OperationalError:
+                        # e.g. the database is locked; back off and retry the batch
+                        db.session.rollback()
+                        if attempt == self.retries:
+                            break
+                        time.sleep(0.1 * 2 ** attempt)
+                    except Exception:
+                        db.session.rollback()
+                        break
+
+                # Save row by row so one bad message does not take the batch with it
+                log.warning("Batch of %d messages failed, saving them one by one", len(batch))
+                for row in batch:
+                    try:
+                        db.session.execute(insert(Message), [row])
+                        db.session.commit()
+                    except Exception:
+                        db.session.rollback()
+                        log.exception("Dropped message %r", row)
+            finally:
+                db.session.remove()
+                for _ in batch:
+                    self.queue.task_done()
+
+
+class MessageWriter:
+    """Write-behind persistence for chat messages.
+
+    ``submit`` queues a row and returns at once; a background thread inserts
+    queued rows in batches of up to ``MESSAGE_WRITER_BATCH_SIZE``, at most
+    ``MESSAGE_WRITER_FLUSH_INTERVAL`` seconds after they arrive. When the queue
+    is full, ``submit`` waits up to ``MESSAGE_WRITER_PUT_TIMEOUT`` seconds and
+    then raises ``WriterFull``. A row missing a required column raises
+    ``ValueError`` at once. Whatever is queued is written on interpreter exit.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("MESSAGE_WRITER_BATCH_SIZE", 200)
+        app.config.setdefault("MESSAGE_WRITER_FLUSH_INTERVAL", 0.25)
+        app.config.setdefault("MESSAGE_WRITER_MAX_QUEUE", 10000)
+        app.config.setdefault("MESSAGE_WRITER_PUT_TIMEOUT", 1.0)
+        app.config.setdefault("MESSAGE_WRITER_RETRIES", 3)
+        writer = _Writer(app)
+        app.extensions["message_writer"] = writer
+        atexit.register(writer.close)
+
+    def submit(self, **values):
+        current_app.extensions["message_writer"].submit(values)
+
+    def flush(self):
+        current_app.extensions["message_writer"].flush()
+
+    def close(self, timeout=None):
+        current_app.extensions["message_writer"].close(timeout)
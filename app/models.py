@@ -3,6 +3,9 @@ from . import db
 from datetime import datetime
 from sqlalchemy import Enum
 from sqlalchemy import ForeignKey
+from sqlalchemy import event
+
+from . import amenities as amenity_vocabulary, clustering, spatial
 
 class CarOwner(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -16,7 +19,6 @@ class CarOwner(db.Model):
     payment_preference = db.Column(db.String(100), nullable=True)
     car_model = db.Column(db.String(100), nullable=False)
     ratings = db.Column(db.Float, default=0.0)
-    history = db.Column(db.JSON, nullable=True)
 
     # Relationships
     
@@ -36,31 +38,145 @@ class Renter(db.Model):
     price = db.Column(db.Float, nullable=False)
     place_type = db.Column(db.String(50), nullable=False)  # residential, commercial
     amenities = db.Column(db.String(200), nullable=True)  # e.g., security, lighting
+    amenity_mask = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bits of app/amenities.py
     timing = db.Column(db.String(100), nullable=False)  # e.g., 9am-5pm
 
-    history = db.Column(db.JSON, nullable=True)  # Track rental history as a JSON list of bookings
-
     # Relationships
     
 class Location(db.Model):
+    __table_args__ = (
+        db.Index('ix_location_available_geocell', 'available', 'geocell'),  # map viewport / nearest
+        db.Index('ix_location_available_id', 'available', 'id'),  # available listings paged by id
+    )
     id = db.Column(db.Integer, primary_key=True)
-    renter_id = db.Column(db.Integer, db.ForeignKey('renter.id'), nullable=False)
+    renter_id = db.Column(db.Integer, db.ForeignKey('renter.id'), index=True, nullable=False)
     place_name = db.Column(db.String(100), nullable=False)
     address = db.Column(db.String(200), nullable=False)
     price = db.Column(db.Float, nullable=False)
     amenities = db.Column(db.String(200), nullable=True)
+    amenity_mask = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bits of app/amenities.py
     available = db.Column(db.Boolean, default=True)
     lat = db.Column(db.Float, nullable=False)  # New column
     lng = db.Column(db.Float, nullable=False)  # New column
+    geocell = db.Column(db.Integer, index=True, nullable=True)  # Spatial grid bucket, see app/spatial.py
 
     # Relationships
     renter = db.relationship('Renter', backref='locations', lazy=True)
 
 
+# Keep the spatial grid bucket in step with the coordinates on every write
+@event.listens_for(Location, 'before_insert')
+@event.listens_for(Location, 'before_update')
+def set_location_geocell(mapper, connection, target):
+    target.geocell = spatial.geocell(target.lat, target.lng)
+
+
+# The amenity string is normalized to the fixed vocabulary, and its bitmask
+# derived from it, whenever it is written
+@event.listens_for(Renter, 'before_insert')
+@event.listens_for(Renter, 'before_update')
+@event.listens_for(Location, 'before_insert')
+@event.listens_for(Location, 'before_update')
+def set_amenity_mask(mapper, connection, target):
+    target.amenity_mask, target.amenities = amenity_vocabulary.normalize(target.amenities)
+
+
+class LocationAmenity(db.Model):
+    # One row per (location, amenity key): the facet index behind amenity
+    # filters and counts, rewritten from Location.amenity_mask on every change
+    __tablename__ = 'location_amenity'
+    __table_args__ = (
+        db.Index('ix_location_amenity_amenity', 'amenity', 'location_id'),  # locations with an amenity
+    )
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id', name='fk_location_amenity_location_id', ondelete='CASCADE'),
+                            primary_key=True)
+    amenity = db.Column(db.String(30), primary_key=True)
+
+
+def _write_location_amenities(connection, location_id, mask):
+    table = LocationAmenity.__table__
+    connection.execute(table.delete().where(table.c.location_id == location_id))
+    keys = amenity_vocabulary.keys(mask)
+    if keys:
+        connection.execute(table.insert(), [{'location_id': location_id, 'amenity': key} for key in keys])
+
+
+@event.listens_for(Location, 'after_insert')
+def insert_location_amenities(mapper, connection, target):
+    _write_location_amenities(connection, target.id, target.amenity_mask)
+
+
+@event.listens_for(Location, 'after_update')
+def update_location_amenities(mapper, connection, target):
+    if db.inspect(target).attrs.amenity_mask.history.has_changes():
+        _write_location_amenities(connection, target.id, target.amenity_mask)
+
+
+@event.listens_for(Location, 'after_delete')
+def delete_location_amenities(mapper, connection, target):
+    _write_location_amenities(connection, target.id, 0)
+
+
+class LocationCluster(db.Model):
+    # Count, coordinate sums and cheapest price of the available locations in
+    # one grid cell per map zoom level, maintained by app/clustering.py
+    __tablename__ = 'location_cluster'
+    level = db.Column(db.SmallInteger, primary_key=True)  # map zoom level
+    row = db.Column(db.Integer, primary_key=True)
+    col = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+    lat_sum = db.Column(db.Float, nullable=False)
+    lng_sum = db.Column(db.Float, nullable=False)
+    min_price = db.Column(db.Float, nullable=True)
+
+
+CLUSTER_ATTRIBUTES = ('lat', 'lng', 'price', 'available')
+
+
+def _cluster_member(target, old=False):
+    values = []
+    for name in CLUSTER_ATTRIBUTES:
+        history = db.inspect(target).attrs[name].history
+        values.append(history.deleted[0] if old and history.deleted else getattr(target, name))
+    return clustering.member(*values)
+
+
+def _keep_replaced_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Load the replaced value on every change of these attributes, even on an
+# expired instance, so the clusters can take the location out of its old cell
+for _name in CLUSTER_ATTRIBUTES:
+    event.listen(getattr(Location, _name), 'set', _keep_replaced_value, active_history=True)
+
+
+@event.listens_for(Location, 'after_insert')
+def insert_location_cluster(mapper, connection, target):
+    clustering.apply_change(connection, None, _cluster_member(target))
+
+
+@event.listens_for(Location, 'after_update')
+def update_location_cluster(mapper, connection, target):
+    clustering.apply_change(connection, _cluster_member(target, old=True), _cluster_member(target))
+
+
+@event.listens_for(Location, 'after_delete')
+def delete_location_cluster(mapper, connection, target):
+    clustering.apply_change(connection, _cluster_member(target), None)
+
+
 class Message(db.Model):
+    __table_args__ = (
+        db.Index('ix_message_booking_id_timestamp', 'booking_id', 'timestamp', 'id'),  # booking thread
+        db.Index('ix_message_booking_id_id', 'booking_id', 'id'),  # thread sync, in the order rows were saved
+        db.Index('ix_message_receiver_timestamp', 'receiver_id', 'receiver_type', 'timestamp'),  # inbox
+    )
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, nullable=False)  # Either CarOwner or Renter
+    sender_type = db.Column(db.String(20), nullable=False)  # 'car_owner' or 'renter', see PARTICIPANT_MODELS
     receiver_id = db.Column(db.Integer, nullable=False)  # Either Renter or CarOwner
+    receiver_type = db.Column(db.String(20), nullable=False)  # 'car_owner' or 'renter'
     message_content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     booking_id = db.Column(db.Integer, ForeignKey('booking.id'), nullable=False)
@@ -75,18 +191,44 @@ class Message(db.Model):
     @property
     def sender(self):
         # Fetch the sender (either CarOwner or Renter)
-        if self.sender_id in [car_owner.id for car_owner in CarOwner.query.all()]:
-            return CarOwner.query.get(self.sender_id)
-        else:
-            return Renter.query.get(self.sender_id)
+        if getattr(self, '_sender', None) is None:
+            self._sender = db.session.get(PARTICIPANT_MODELS[self.sender_type], self.sender_id)
+        return self._sender
 
     @property
     def receiver(self):
         # Fetch the receiver (either Renter or CarOwner)
-        if self.receiver_id in [car_owner.id for car_owner in CarOwner.query.all()]:
-            return CarOwner.query.get(self.receiver_id)
-        else:
-            return Renter.query.get(self.receiver_id)
+        if getattr(self, '_receiver', None) is None:
+            self._receiver = db.session.get(PARTICIPANT_MODELS[self.receiver_type], self.receiver_id)
+        return self._receiver
+
+    @classmethod
+    def load_participants(cls, messages):
+        # Resolve sender and receiver for a whole thread with one query per user table
+        ids = {user_type: set() for user_type in PARTICIPANT_MODELS}
+        for message in messages:
+            ids[message.sender_type].add(message.sender_id)
+            ids[message.receiver_type].add(message.receiver_id)
+
+        users = {}
+        for user_type, user_ids in ids.items():
+            if user_ids:
+                model = PARTICIPANT_MODELS[user_type]
+                for user in model.query.filter(model.id.in_(user_ids)).all():
+                    users[(user_type, user.id)] = user
+
+        for message in messages:
+            message._sender = users.get((message.sender_type, message.sender_id))
+            message._receiver = users.get((message.receiver_type, message.receiver_id))
+        return messages
+
+
+# Message participants are identified by (type, id) since ids overlap across the user tables
+PARTICIPANT_MODELS = {'car_owner': CarOwner, 'renter': Renter}
+
+
+def other_participant_type(user_type):
+    return 'renter' if user_type == 'car_owner' else 'car_owner'
 
 
 from sqlalchemy import ForeignKey
@@ -106,6 +248,13 @@ class PaymentStatus(enum.Enum):
 
 class Booking(db.Model):
     __tablename__ = 'booking'
+    __table_args__ = (
+        db.Index('ix_booking_car_owner_id_deleted', 'car_owner_id', 'deleted'),  # car owner dashboard
+        db.Index('ix_booking_car_owner_id_created_at', 'car_owner_id', 'created_at', 'id'),  # car owner listings
+        db.Index('ix_booking_renter_id_created_at', 'renter_id', 'created_at', 'id'),  # renter listings
+        db.Index('ix_booking_renter_id_status', 'renter_id', 'status'),  # renter's approved bookings
+        db.Index('ix_booking_status_preferred_date', 'status', 'preferred_date'),  # expiry sweep
+    )
     id = db.Column(db.Integer, primary_key=True)
     car_owner_id = db.Column(db.Integer, db.ForeignKey('car_owner.id', name='fk_booking_car_owner_id'), index=True, nullable=False)
     renter_id = db.Column(db.Integer, db.ForeignKey('renter.id', name='fk_booking_renter_id'), index=True, nullable=False)
@@ -125,63 +274,149 @@ class Booking(db.Model):
     location = db.relationship("Location", backref="bookings", lazy=True)
 
 
+    @classmethod
+    def listing_query(cls):
+        # Booking tables render the renter, car owner and location of every row,
+        # so load them in the same SELECT instead of one lazy load per row
+        return cls.query.options(
+            db.joinedload(cls.renter),
+            db.joinedload(cls.car_owner),
+            db.joinedload(cls.location),
+        )
+
     @property
     def can_message(self):
         return self.status == "Approved"
 
-    # After booking approval, the location becomes unavailable
+    # The booking's date was already claimed when it was requested (see
+    # app/reservations.py), so approval leaves the spot open on other dates
     def approve_booking(self):
         if self.status != BookingStatus.Pending:
             raise ValueError("Booking has already been processed.")
 
         self.status = BookingStatus.Approved
-        if self.location:
-            self.location.available = False
         self.add_to_histories()
         db.session.commit()
 
-    # Add to car owner's and renter's booking history
+    # Add to car owner's and renter's booking history, one appended row each
     def add_to_histories(self):
-        car_owner = self.car_owner
-        renter = self.renter
-
-        # Update CarOwner's history
-        if car_owner.history is None:
-            car_owner.history = []
-        else:
-            car_owner.history = list(car_owner.history)
-
-        car_owner.history.append({
-            'location': self.location.place_name,
-            'preferred_date': self.preferred_date.isoformat(),
-            'status': self.status.value,
-        })
-
-        # Update Renter's history
-        if renter.history is None:
-            renter.history = []
-        else:
-            renter.history = list(renter.history)
-
-        renter.history.append({
-            'location': self.location.place_name,
-            'preferred_date': self.preferred_date.isoformat(),
-            'status': self.status.value,
-        })
+        for user_type, user_id in (('car_owner', self.car_owner_id), ('renter', self.renter_id)):
+            db.session.add(BookingHistory(
+                user_type=user_type,
+                user_id=user_id,
+                booking_id=self.id,
+                location=self.location.place_name if self.location else None,
+                preferred_date=self.preferred_date,
+                status=self.status.value,
+            ))
 
         db.session.commit()
 
+class Reservation(db.Model):
+    # One row per booked (location, date); the unique constraint is what stops
+    # two bookings claiming the same slot, however many requests race for it
+    __tablename__ = 'reservation'
+    __table_args__ = (
+        db.UniqueConstraint('location_id', 'date', name='uq_reservation_location_date'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id', name='fk_reservation_location_id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id', name='fk_reservation_booking_id', ondelete='CASCADE'),
+                           unique=True, nullable=False)
+
+    # Relationships
+    booking = db.relationship('Booking', backref=db.backref('reservation', uselist=False, lazy=True,
+                                                            cascade='all, delete-orphan'))
+    # Deleting a location frees its slots, so a location that later reuses the id starts empty
+    location = db.relationship('Location', backref=db.backref('reservations', lazy=True,
+                                                              cascade='all, delete-orphan'))
+
+
+class AvailabilityBlock(db.Model):
+    # Dates a renter has taken a location off the calendar, start and end inclusive
+    __tablename__ = 'availability_block'
+    __table_args__ = (
+        db.Index('ix_availability_block_location', 'location_id', 'start_date', 'end_date'),  # overlap checks
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id', name='fk_availability_block_location_id'), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+
+    # Relationships
+    location = db.relationship('Location', backref=db.backref('availability_blocks', lazy=True,
+                                                              cascade='all, delete-orphan'))
+
+
+class BookingHistory(db.Model):
+    # Append-only log of processed bookings per user; rows are never updated
+    __tablename__ = 'booking_history'
+    __table_args__ = (
+        db.Index('ix_booking_history_user', 'user_type', 'user_id', 'id'),  # a user's history, newest first
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_type = db.Column(db.String(20), nullable=False)  # 'car_owner' or 'renter', see PARTICIPANT_MODELS
+    user_id = db.Column(db.Integer, nullable=False)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id', ondelete='SET NULL'), nullable=True)  # NULL for entries migrated from the old JSON history
+    location = db.Column(db.String(100), nullable=True)
+    preferred_date = db.Column(db.Date, nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)  # NULL for migrated entries
 
-    # After booking time is over, the location becomes available again
     @classmethod
-    def after_booking_ends(cls, booking_id):
-        booking = cls.query.get(booking_id)
-        if not booking:
-            raise ValueError(f"No booking found with ID {booking_id}")
-
-        if booking.location:
-            booking.location.available = True
-            db.session.commit()
+    def for_user(cls, user_type, user_id):
+        return cls.query.filter_by(user_type=user_type, user_id=user_id)
+
+
+class InboxSummary(db.Model):
+    # Per user and booking: unread message count and the latest message, kept
+    # up to date on every message insert and read by app/inbox.py
+    __tablename__ = 'inbox_summary'
+    __table_args__ = (
+        db.Index('ix_inbox_summary_user', 'user_type', 'user_id', 'last_message_at', 'booking_id'),  # inbox order
+    )
+    user_type = db.Column(db.String(20), primary_key=True)  # 'car_owner' or 'renter', see PARTICIPANT_MODELS
+    user_id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id', name='fk_inbox_summary_booking_id', ondelete='CASCADE'),
+                           primary_key=True)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    last_message_at = db.Column(db.DateTime, nullable=True)
+    last_message_preview = db.Column(db.String(200), nullable=True)
+    last_sender_type = db.Column(db.String(20), nullable=True)
+
+
+class ScheduledJob(db.Model):
+    # Persistent state and metrics of a background job, see app/scheduler.py
+    __tablename__ = 'scheduled_job'
+    name = db.Column(db.String(100), primary_key=True)
+    next_run_at = db.Column(db.DateTime, nullable=True)
+    last_started_at = db.Column(db.DateTime, nullable=True)
+    last_duration_ms = db.Column(db.Float, nullable=True)
+    last_rows = db.Column(db.Integer, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    run_count = db.Column(db.Integer, nullable=False, default=0)
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PriceSuggestion(db.Model):
+    # Latest suggested price per location, replaced in bulk by app/pricing.py
+    __tablename__ = 'price_suggestion'
+    location_id = db.Column(db.Integer, db.ForeignKey('location.id', name='fk_price_suggestion_location_id', ondelete='CASCADE'),
+                            primary_key=True)
+    base_price = db.Column(db.Float, nullable=False)  # Location.price when computed
+    suggested_price = db.Column(db.Float, nullable=False)
+    demand = db.Column(db.Float, nullable=False)  # area booking rate relative to the average area
+    occupancy = db.Column(db.Float, nullable=False)  # share of the window's days booked
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+
+class DataVersion(db.Model):
+    # Monotonic counter per data set, bumped in the same transaction as any change
+    # to it; read by app/versioning.py for ETags and payload caching
+    __tablename__ = 'data_version'
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
 
 import enum
 
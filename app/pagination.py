@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import Date, DateTime, and_, or_
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(column, value):
+    if value is not None and isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if value is not None and isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    return value
+
+
+def encode_cursor(values):
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def row_cursor(row, columns):
+    # Cursor that continues right after ``row``
+    return encode_cursor([getattr(row, column.key) for column in columns])
+
+
+def decode_cursor(cursor, columns):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except (TypeError, ValueError):
+        # TypeError: a value of the wrong JSON type for its column, e.g. a number for a date
+        raise ValueError("Invalid pagination cursor")
+
+
+def _after(columns, values, descending):
+    # (a, b) > (x, y) spelled out as a > x OR (a = x AND b > y), which every
+    # backend can answer from an index on the same columns
+    clauses = []
+    for i, column in enumerate(columns):
+        bound = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*[columns[j] == values[j] for j in range(i)], bound))
+    return or_(*clauses)
+
+
+def paginate_keyset(query, columns, cursor=None, limit=50, descending=False):
+    """Return one page of ``query`` ordered by ``columns``, starting after ``cursor``.
+
+    ``columns`` must end with a unique column (normally the primary key) so the
+    order is total. Raises ``ValueError`` for a malformed cursor.
+    """
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = row_cursor(rows[-1], columns)
+    return KeysetPage(rows, next_cursor)
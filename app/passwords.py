@@ -0,0 +1,119 @@
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# werkzeug's scrypt defaults, spelled out so stored hashes can be compared with the config
+DEFAULT_SCRYPT_PARAMETERS = "32768:8:1"
+
+
+class HasherBusy(RuntimeError):
+    pass
+
+
+def normalize_method(method):
+    """The method prefix werkzeug stores for ``method``, cost included,
+    e.g. ``pbkdf2:sha256`` -> ``pbkdf2:sha256:600000``."""
+    parts = method.split(":")
+    if parts[0] == "pbkdf2":
+        if len(parts) == 1:
+            parts.append("sha256")
+        if len(parts) == 2:
+            parts.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    elif parts[0] == "scrypt" and len(parts) == 1:
+        parts.append(DEFAULT_SCRYPT_PARAMETERS)
+    return ":".join(parts)
+
+
+class _Pool:
+    """The hashing threads of one app.
+
+    hashlib's PBKDF2 and scrypt release the GIL, so up to ``workers`` hashes
+    run in parallel while request threads only wait. At most ``max_pending``
+    hashes are queued or running; past that a caller waits ``queue_timeout``
+    seconds for a slot and then gets ``HasherBusy``.
+    """
+
+    def __init__(self, app):
+        self.method = normalize_method(app.config["PASSWORD_HASH_METHOD"])
+        self.salt_length = app.config["PASSWORD_SALT_LENGTH"]
+        self.workers = app.config["PASSWORD_HASH_WORKERS"] or os.cpu_count() or 1
+        self.queue_timeout = app.config["PASSWORD_HASH_QUEUE_TIMEOUT"]
+        self._slots = threading.BoundedSemaphore(app.config["PASSWORD_HASH_MAX_PENDING"])
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _submit(self, func, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HasherBusy("Too many password checks in progress.")
+        try:
+            with self._lock:
+                # Started on first use, so forked workers get their own threads
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hasher")
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._submit(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, stored, password):
+        return self._submit(check_password_hash, stored, password)
+
+    def needs_rehash(self, stored):
+        return stored.split("$", 1)[0] != self.method
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class PasswordHasher:
+    """Password hashing off the request threads, with the algorithm and cost
+    set by ``PASSWORD_HASH_METHOD`` (any werkzeug method, e.g.
+    ``pbkdf2:sha256:600000`` or ``scrypt:32768:8:1``).
+
+    Hashes made with other parameters still verify; ``login`` rehashes them
+    with the current ones on the next successful login.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("PASSWORD_HASH_METHOD", "pbkdf2:sha256:600000")
+        app.config.setdefault("PASSWORD_SALT_LENGTH", 16)
+        app.config.setdefault("PASSWORD_HASH_WORKERS", None)
+        app.config.setdefault("PASSWORD_HASH_MAX_PENDING", 64)
+        app.config.setdefault("PASSWORD_HASH_QUEUE_TIMEOUT", 2.0)
+        pool = _Pool(app)
+        app.extensions["password_hasher"] = pool
+        atexit.register(pool.close)
+
+    def hash(self, password):
+        return current_app.extensions["password_hasher"].hash(password)
+
+    def verify(self, stored, password):
+        return current_app.extensions["password_hasher"].verify(stored, password)
+
+    def needs_rehash(self, stored):
+        return current_app.extensions["password_hasher"].needs_rehash(stored)
+
+    def check_and_upgrade(self, user, password):
+        """Verify ``password`` for ``user``; on success, replace a hash made with
+        old parameters (the caller commits). Raises ``HasherBusy``."""
+        if not self.verify(user.password, password):
+            return False
+        if self.needs_rehash(user.password):
+            user.password = self.hash(password)
+        return True
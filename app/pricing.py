@@ -0,0 +1,141 @@
+from datetime import date, datetime, timedelta
+
+import click
+import numpy as np
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, insert
+
+from . import cache, clustering, db
+from .models import Booking, BookingStatus, Location, PriceSuggestion, Renter
+
+
+def _locations():
+    # Column arrays of every location, sorted by id
+    rows = db.session.query(Location.id, Location.lat, Location.lng, Location.price, Renter.place_type).outerjoin(
+        Renter, Location.renter_id == Renter.id
+    ).order_by(Location.id).all()
+    return (
+        np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((row[1] or 0 for row in rows), dtype=np.float64, count=len(rows)),
+        np.fromiter((row[2] or 0 for row in rows), dtype=np.float64, count=len(rows)),
+        np.fromiter((row[3] or 0 for row in rows), dtype=np.float64, count=len(rows)),
+        np.array([row[4] or "" for row in rows], dtype=object),
+    )
+
+
+def _bookings(start, end):
+    # (location_id, days from start) of the live bookings dated inside the window
+    rows = db.session.query(Booking.location_id, Booking.preferred_date).filter(
+        Booking.location_id.isnot(None),
+        Booking.deleted == False,  # noqa: E712
+        Booking.status != BookingStatus.Rejected,
+        Booking.preferred_date.between(start, end),
+    ).all()
+    location_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    days = np.fromiter(((row[1] - start).days for row in rows), dtype=np.int64, count=len(rows))
+    return location_ids, days
+
+
+def _areas(lat, lng, zoom):
+    # Index of each location's area: its cluster grid cell at ``zoom``, numbered 0..n-1
+    size = clustering.cell_size(zoom)
+    rows = np.floor((lat + 90) / size).astype(np.int64)
+    cols = np.floor((lng + 180) / size).astype(np.int64)
+    _, areas = np.unique(rows * int(round(360 / size)) + cols, return_inverse=True)
+    return areas.reshape(-1)
+
+
+def compute_suggestions(today=None):
+    """Suggested price of every location from recent demand, in one vectorized pass.
+
+    Returns ``(ids, base_prices, suggested_prices, demand, occupancy)`` arrays.
+    ``demand`` is the area's booking rate relative to the average area, with
+    bookings weighted by how close their date is to ``today``; ``occupancy``
+    is the share of the window's days the location itself is booked. The
+    final multiplier, place type factor included, stays within
+    ``PRICING_MIN_MULTIPLIER`` and ``PRICING_MAX_MULTIPLIER``.
+    """
+    config = current_app.config
+    today = today or date.today()
+    start = today - timedelta(days=config["PRICING_LOOKBACK_DAYS"])
+    end = today + timedelta(days=config["PRICING_LOOKAHEAD_DAYS"])
+    window_days = (end - start).days + 1
+
+    ids, lat, lng, base, place_types = _locations()
+    if not len(ids):
+        empty = np.empty(0)
+        return ids, empty, empty, empty, empty
+
+    booked_ids, days = _bookings(start, end)
+    positions = np.searchsorted(ids, booked_ids)
+    found = positions < len(ids)
+    found[found] = ids[positions[found]] == booked_ids[found]
+    positions, days = positions[found], days[found]
+
+    # Demand: recency-weighted bookings per location in each area, against the overall rate
+    weights = 0.5 ** (np.abs(days - (today - start).days) / config["PRICING_HALF_LIFE_DAYS"])
+    areas = _areas(lat, lng, config["PRICING_AREA_ZOOM"])
+    area_bookings = np.bincount(areas[positions], weights=weights, minlength=areas.max() + 1)
+    area_locations = np.bincount(areas)
+    overall = weights.sum() / len(ids)
+    demand = (area_bookings / area_locations)[areas] / overall if overall else np.ones(len(ids))
+
+    # Occupancy against the area's average, so an area without bookings (or a
+    # spot booked as often as its neighbours) gets no occupancy adjustment
+    occupancy = np.minimum(np.bincount(positions, minlength=len(ids)) / window_days, 1.0)
+    area_occupancy = np.bincount(areas, weights=occupancy) / area_locations
+
+    factors = config["PRICING_PLACE_TYPE_FACTORS"]
+    multiplier = (1
+                  + config["PRICING_DEMAND_WEIGHT"] * (demand - 1)
+                  + config["PRICING_OCCUPANCY_WEIGHT"] * (occupancy - area_occupancy[areas]))
+    multiplier *= np.array([factors.get(place_type, 1.0) for place_type in place_types])
+    multiplier = np.clip(multiplier, config["PRICING_MIN_MULTIPLIER"], config["PRICING_MAX_MULTIPLIER"])
+
+    return ids, base, np.round(base * multiplier, 2), demand, occupancy
+
+
+def update_price_suggestions(today=None):
+    """Recompute and store every suggestion; returns the number stored.
+
+    Runs as a scheduled job and as ``flask suggest-prices``. The table is
+    replaced with one DELETE and one multi-row INSERT in a single transaction.
+    """
+    ids, base, suggested, demand, occupancy = compute_suggestions(today)
+    computed_at = datetime.utcnow()
+    db.session.execute(delete(PriceSuggestion).execution_options(synchronize_session=False))
+    if len(ids):
+        db.session.execute(insert(PriceSuggestion), [
+            {"location_id": location_id, "base_price": base_price, "suggested_price": price,
+             "demand": round(area_demand, 4), "occupancy": round(share, 4), "computed_at": computed_at}
+            for location_id, base_price, price, area_demand, share in zip(
+                ids.tolist(), base.tolist(), suggested.tolist(), demand.tolist(), occupancy.tolist())
+        ])
+    db.session.commit()
+    return len(ids)
+
+
+@cache.memoize(depends_on=[PriceSuggestion])
+def suggested_price(location_id):
+    # Latest suggestion for one location as plain data, or None before the first run
+    suggestion = db.session.get(PriceSuggestion, location_id)
+    if suggestion is None:
+        return None
+    return {
+        "suggested_price": suggestion.suggested_price,
+        "base_price": suggestion.base_price,
+        "demand": suggestion.demand,
+        "occupancy": suggestion.occupancy,
+        "computed_at": suggestion.computed_at.isoformat(),
+    }
+
+
+@click.command("suggest-prices")
+@click.option("--date", "today", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="Price as of this day instead of today.")
+@with_appcontext
+def suggest_prices_command(today):
+    """Recompute suggested prices for every location."""
+    count = update_price_suggestions(today.date() if today else None)
+    click.echo(f"Stored suggested prices for {count} locations.")
@@ -0,0 +1,128 @@
+from datetime import date, datetime
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .models import AvailabilityBlock, Booking, BookingHistory, BookingStatus, Reservation
+
+
+class SlotTaken(ValueError):
+    pass
+
+
+def reserve(booking):
+    """Claim ``booking``'s (location, date) slot in the current transaction.
+
+    The claim is an INSERT guarded by the ``(location_id, date)`` unique
+    constraint, so only the row locks of that slot are involved and exactly one
+    of any number of concurrent claims succeeds. The losers get ``SlotTaken``;
+    the claim runs in a savepoint, so the rest of their transaction is intact.
+    """
+    if booking.reservation is not None:
+        return booking.reservation
+    day = booking.preferred_date
+    if AvailabilityBlock.query.filter(
+        AvailabilityBlock.location_id == booking.location_id,
+        AvailabilityBlock.start_date <= day,
+        AvailabilityBlock.end_date >= day,
+    ).first() is not None:
+        raise SlotTaken("This spot is not available on that date.")
+    reservation = Reservation(location_id=booking.location_id, date=booking.preferred_date)
+    try:
+        with db.session.begin_nested():
+            booking.reservation = reservation
+    except IntegrityError:
+        booking.reservation = None
+        raise SlotTaken("This spot is already booked on that date.")
+    return reservation
+
+
+def release(booking):
+    # Free the slot so another booking can claim the date
+    booking.reservation = None
+
+
+def sync_reservation(booking):
+    # Rejected and removed bookings hold no slot; everything else keeps one
+    if booking.deleted or booking.status in (BookingStatus.Rejected, BookingStatus.Rejected.value):
+        release(booking)
+    else:
+        reserve(booking)
+
+
+def bulk_update_status(bookings, status):
+    """Move ``bookings`` to ``status`` in the current transaction; returns
+    ``{booking_id: outcome}``.
+
+    Follows ``approve_booking`` and ``sync_reservation``: only pending requests
+    can be approved, approval appends history entries, rejection frees the date
+    and any other status must hold (or win back) its date. The status change,
+    slot release and history are one set-based statement each, however many
+    bookings are given. Load the bookings with their ``location`` and
+    ``reservation`` to avoid a lazy load per booking.
+    """
+    outcomes, changed = {}, []
+    for booking in bookings:
+        if booking.status == status:
+            outcomes[booking.id] = "unchanged"
+        elif status == BookingStatus.Approved and booking.status != BookingStatus.Pending:
+            outcomes[booking.id] = "already_processed"
+        else:
+            changed.append(booking)
+
+    if status != BookingStatus.Rejected:
+        for booking in [booking for booking in changed if booking.reservation is None]:
+            try:
+                reserve(booking)
+            except SlotTaken:
+                outcomes[booking.id] = "slot_taken"
+                changed.remove(booking)
+
+    ids = [booking.id for booking in changed]
+    if not ids:
+        return outcomes
+
+    db.session.execute(
+        update(Booking).where(Booking.id.in_(ids))
+        .values(status=status, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    if status == BookingStatus.Rejected:
+        db.session.execute(
+            delete(Reservation).where(Reservation.booking_id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+    if status == BookingStatus.Approved:
+        db.session.execute(insert(BookingHistory), [
+            {
+                "user_type": user_type,
+                "user_id": user_id,
+                "booking_id": booking.id,
+                "location": booking.location.place_name if booking.location else None,
+                "preferred_date": booking.preferred_date,
+                "status": status.value,
+            }
+            for booking in changed
+            for user_type, user_id in (("car_owner", booking.car_owner_id), ("renter", booking.renter_id))
+        ])
+    outcomes.update(dict.fromkeys(ids, "updated"))
+    return outcomes
+
+
+def expire_pending_bookings(today=None):
+    """Reject every request still pending after its date, in one UPDATE.
+
+    Runs as a scheduled job; returns the number of bookings expired. Their
+    reservations are for past dates, block nothing and are kept for the
+    calendar.
+    """
+    today = today or date.today()
+    result = db.session.execute(
+        update(Booking)
+        .where(Booking.status == BookingStatus.Pending, Booking.preferred_date < today)
+        .values(status=BookingStatus.Rejected, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
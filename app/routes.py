@@ -1,16 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash,jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from .models import db, CarOwner, Renter, Booking, Location, Message, BookingStatus, PaymentStatus
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash,jsonify, abort
+from .models import db, AvailabilityBlock, CarOwner, Renter, Booking, BookingHistory, InboxSummary, Location, Message, BookingStatus, PaymentStatus, other_participant_type
+from . import amenities as amenity_vocabulary, availability, cache, clustering, inbox, location_search, location_snapshot, password_hasher, pricing, spatial, versioned_cache
+from .versioning import LOCATIONS
+from .pagination import KeysetPage, paginate_keyset, row_cursor
+from .passwords import HasherBusy
+from .reservations import SlotTaken, bulk_update_status, release, reserve, sync_reservation
+from .streaming import FORMATS, stream_response
 import os
-from flask import send_from_directory,current_app, Flask
+from flask import send_from_directory,current_app
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from flask_socketio import SocketIO
-from flask_socketio import SocketIO, emit, join_room, leave_room
-
-app = Flask(__name__)
-socketio = SocketIO(app)  # Now it should work
-
 # from flask_login import current_user
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
@@ -20,6 +19,35 @@ def allowed_file(filename):
 
 
 
+def keyset_page(query, columns, cursor_arg="cursor", descending=False):
+    # One page of a listing, continuing from the cursor in the query string
+    try:
+        return paginate_keyset(query, columns, request.args.get(cursor_arg),
+                               current_app.config["PAGE_SIZE"], descending)
+    except ValueError as e:
+        abort(400, description=str(e))
+
+
+def requested_dates():
+    # Optional ?start=&end= (ISO dates, inclusive): only spots free on every day in between
+    if not request.args.get("start"):
+        return None
+    return availability.parse_date_range(request.args["start"], request.args.get("end"))
+
+
+def requested_amenities():
+    # Optional ?amenities=covered,security: only spots offering all of them
+    return amenity_vocabulary.parse_filter(request.args.get("amenities", ""))
+
+
+# A booking's conversation is ordered by (timestamp, id), served by ix_message_booking_id_timestamp
+MESSAGE_ORDER = [Message.timestamp, Message.id]
+# Incremental sync follows ids instead, served by ix_message_booking_id_id: a chat
+# message is timestamped when sent but saved by the message writer a little
+# later, and only the id grows in the order rows are saved
+MESSAGE_SYNC_ORDER = [Message.id]
+
+
 bp = Blueprint('routes', __name__)
 @bp.route("/", methods=["GET"])
 def about():
@@ -56,7 +84,11 @@ def car_owner_register():
             return redirect(url_for("routes.car_owner_register"))
 
         # Hash the password and create a new user
-        hashed_password = generate_password_hash(password)
+        try:
+            hashed_password = password_hasher.hash(password)
+        except HasherBusy:
+            flash("The server is busy. Please try again in a moment.", "danger")
+            return redirect(url_for("routes.car_owner_register"))
         new_owner = CarOwner(
             name=name,
             username=username,
@@ -84,7 +116,11 @@ def renter_register():
         name = request.form["name"]
         username = request.form["username"]
         email = request.form["email"]
-        password = generate_password_hash(request.form["password"])
+        try:
+            password = password_hasher.hash(request.form["password"])
+        except HasherBusy:
+            flash("The server is busy. Please try again in a moment.", "danger")
+            return redirect(url_for("routes.renter_register"))
         renting_place = request.form["renting_place"]
         price = request.form["price"]
         place_type = request.form["place_type"]
@@ -99,7 +135,7 @@ def renter_register():
         db.session.commit()
         flash("Registration successful!", "success")
         return redirect(url_for("routes.login"))
-    return render_template("renter_register.html")
+    return render_template("renter_register.html", amenity_choices=amenity_vocabulary.AMENITIES)
 
 @bp.route("/login", methods=["GET", "POST"])
 def login():
@@ -117,8 +153,18 @@ def login():
             flash("Invalid user type selected.", "danger")
             return redirect(url_for("routes.login"))
 
-        # Check if user exists and the password matches
-        if user and check_password_hash(user.password, password):
+        # Check if user exists and the password matches; a hash made with
+        # old PASSWORD_HASH_METHOD settings is replaced on the way
+        try:
+            authenticated = user is not None and password_hasher.check_and_upgrade(user, password or "")
+        except HasherBusy:
+            flash("The server is busy. Please try again in a moment.", "danger")
+            return redirect(url_for("routes.login"))
+
+        if authenticated:
+            if db.session.is_modified(user):
+                db.session.commit()
+
             # Save user data in session
             session["user_id"] = user.id
             session["user_type"] = user_type
@@ -148,71 +194,33 @@ def dashboard():
     
     # Handle search functionality
     search_query = request.args.get("search", "").strip()
+    pagination = None
     if search_query:
-        # Perform a case-insensitive search on place_name or address
-        locations = Location.query.filter(
-            (Location.place_name.ilike(f"%{search_query}%")) |
-            (Location.address.ilike(f"%{search_query}%"))
-        ).filter(Location.available == True).all()
+        # Full-text search on place_name and address, best matches first
+        pagination = location_search.filter(
+            Location.query.filter(Location.available == True), search_query
+        ).paginate(
+            page=request.args.get("page", 1, type=int),
+            per_page=current_app.config["SEARCH_PER_PAGE"],
+            error_out=False
+        )
+        locations = pagination.items
     else:
         # Default behavior: Fetch all available locations
-        locations = Location.query.filter(Location.available == True).all()
+        locations = None
     
     
-    bookings = Booking.query.filter_by(car_owner_id=car_owner_id, deleted=False).all()
+    bookings = Booking.listing_query().filter_by(car_owner_id=car_owner_id, deleted=False).all()
     
     # Prepare locations data with lat/lng fields
-    locations_data = [
-        {
-            "id": location.id,
-            "place_name": location.place_name,
-            "address": location.address,
-            "price": location.price,
-            "amenities": location.amenities,
-            "available": location.available,
-            "lat": location.lat,  # Use the correct latitude field
-            "lng": location.lng   # Use the correct longitude field
-        }
-        for location in locations
-    ]
-
-    return render_template("dashboard.html", car_owner=car_owner, locations=locations_data, bookings=bookings)
-
-@socketio.on('send_message')
-def handle_send_message(data):
-    sender_id = data['sender_id']
-    receiver_id = data['receiver_id']
-    message_content = data['message_content']
-    booking_id = data['booking_id']
-
-    # Create a new message
-    new_message = Message(
-        sender_id=sender_id,
-        receiver_id=receiver_id,
-        message_content=message_content,
-        booking_id=booking_id
-    )
-    db.session.add(new_message)
-    db.session.commit()
+    if locations is None:
+        locations_data = available_locations_data()
+    else:
+        locations_data = [serialize_location(location) for location in locations]
 
-    # Emit the message to the receiver
-    emit('receive_message', {
-        'sender_id': sender_id,
-        'receiver_id': receiver_id,
-        'message_content': message_content,
-        'timestamp': new_message.timestamp.isoformat(),
-        'booking_id': booking_id
-    }, room=f'booking_{booking_id}')
-
-@socketio.on('join_room')
-def handle_join_room(data):
-    booking_id = data['booking_id']
-    join_room(f'booking_{booking_id}')
-
-@socketio.on('leave_room')
-def handle_leave_room(data):
-    booking_id = data['booking_id']
-    leave_room(f'booking_{booking_id}')
+    return render_template("dashboard.html", car_owner=car_owner, locations=locations_data, bookings=bookings,
+                           pagination=pagination, search_query=search_query,
+                           cluster_max_zoom=clustering.MAX_ZOOM)
 
 @bp.route('/request_booking', methods=['POST'])
 def request_booking():
@@ -257,13 +265,18 @@ def request_booking():
     )
 
     try:
-        # Add the new booking request to the session and commit
+        # Add the new booking request, claim its date and commit
         db.session.add(new_booking)
+        reserve(new_booking)
         db.session.commit()
         
         # Send a success message and redirect to the dashboard
         flash("Booking request submitted successfully!", "success")
         return redirect(url_for('routes.dashboard'))
+    except SlotTaken as e:
+        db.session.rollback()
+        flash(str(e), "danger")
+        return redirect(url_for('routes.dashboard'))
     except Exception as e:
         # In case of an error, rollback the transaction and display an error message
         db.session.rollback()
@@ -285,14 +298,71 @@ def update_booking_status(booking_id):
         flash('Invalid status selected.', 'error')
         return redirect(url_for('routes.dashboard'))  # Redirect back to booking list
 
-    # Update the booking status
+    # Update the booking status; a rejected booking gives up its date
     booking.status = new_status
-    db.session.commit()
+    try:
+        sync_reservation(booking)
+        db.session.commit()
+    except SlotTaken as e:
+        db.session.rollback()
+        flash(str(e), 'error')
+        return redirect(url_for('routes.dashboard'))
 
     flash('Booking status updated successfully.', 'success')
     return redirect(url_for('routes.dashboard'))  # Redirect back to the booking list
 
 
+@bp.route('/bookings/batch_status', methods=['POST'])
+def batch_update_booking_status():
+    # Set one status on many bookings: {"booking_ids": [...], "status": "Approved"}.
+    # Everything commits together; the response lists an outcome per id
+    if "user_id" not in session or session.get("user_type") != "renter":
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    data = request.get_json(silent=True) or {}
+    booking_ids = data.get("booking_ids")
+    status = data.get("status")
+    if (not isinstance(booking_ids, list) or not booking_ids
+            or not all(type(booking_id) is int for booking_id in booking_ids)):  # JSON true/false are not ids
+        return jsonify({"success": False, "message": "booking_ids must be a non-empty list of ids."}), 400
+    if len(booking_ids) > current_app.config["BOOKING_BATCH_MAX"]:
+        return jsonify({"success": False,
+                        "message": f"At most {current_app.config['BOOKING_BATCH_MAX']} bookings per batch."}), 400
+    if status not in [s.value for s in BookingStatus]:
+        return jsonify({"success": False, "message": "Invalid status selected."}), 400
+
+    booking_ids = list(dict.fromkeys(booking_ids))
+    bookings = Booking.query.options(
+        db.joinedload(Booking.location), db.selectinload(Booking.reservation)
+    ).filter(Booking.id.in_(booking_ids)).all()
+    found = {booking.id: booking for booking in bookings}
+
+    outcomes = {}
+    owned = []
+    for booking_id in booking_ids:
+        booking = found.get(booking_id)
+        if booking is None:
+            outcomes[booking_id] = "not_found"
+        elif booking.renter_id != session["user_id"]:
+            outcomes[booking_id] = "forbidden"
+        else:
+            owned.append(booking)
+
+    try:
+        outcomes.update(bulk_update_status(owned, BookingStatus(status)))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"success": False, "message": str(e)}), 500
+
+    return jsonify({
+        "success": True,
+        "status": status,
+        "updated": sum(outcome == "updated" for outcome in outcomes.values()),
+        "results": [{"id": booking_id, "outcome": outcomes[booking_id]} for booking_id in booking_ids],
+    })
+
+
 # Route to render the booking form
 @bp.route('/booking_form/<location_id>', methods=['GET'])
 def booking_form(location_id):
@@ -309,7 +379,8 @@ def booking_form(location_id):
         return redirect(url_for('routes.dashboard'))
 
     # Render the booking form page with location and renter details
-    return render_template('booking_form.html', location=location, renter=renter)
+    return render_template('booking_form.html', location=location, renter=renter,
+                           suggestion=pricing.suggested_price(location.id))
 
 @bp.route('/process_payment/<int:booking_id>', methods=['POST'])
 def process_payment(booking_id):
@@ -341,8 +412,9 @@ def remove_booking(booking_id):
     if not booking:
         return jsonify({"success": False, "message": "Booking not found"}), 404
 
-    # Mark the booking as removed (soft delete)
+    # Mark the booking as removed (soft delete) and free its date
     booking.deleted = True
+    release(booking)
     db.session.commit()
     return jsonify({"success": True})
 @bp.route("/delete_booking/<int:booking_id>", methods=["POST"])
@@ -357,22 +429,26 @@ def delete_booking(booking_id):
         return jsonify(success=False, message=str(e)), 400
 
 @bp.route("/requested_booking", methods=["GET"])
+@cache.cached_view(depends_on=[Booking, Location, Renter])
 def requested_booking():
     if "user_id" not in session or session.get("user_type") != "car_owner":
         flash("Access denied. Please log in as a car owner.", "danger")
         return redirect(url_for("routes.login"))
 
     car_owner_id = session.get("user_id")
-    bookings = Booking.query.filter_by(car_owner_id=car_owner_id).all()
+    page = keyset_page(Booking.listing_query().filter_by(car_owner_id=car_owner_id),
+                       [Booking.created_at, Booking.id], descending=True)
 
-    return render_template("requested_booking.html", bookings=bookings)
+    return render_template("requested_booking.html", bookings=page.items, next_cursor=page.next_cursor)
 
 
 
 @bp.route('/booking_history', methods=['GET'])
+@cache.cached_view(depends_on=[Booking, Location])
 def booking_history():
     car_owner_id = session.get("user_id")
-    bookings = Booking.query.filter_by(car_owner_id=car_owner_id).all()
+    page = keyset_page(Booking.listing_query().filter_by(car_owner_id=car_owner_id),
+                       [Booking.created_at, Booking.id], descending=True)
     booking_data = [
         {
             "id": booking.id,
@@ -381,9 +457,31 @@ def booking_history():
             "total": booking.location.price if booking.location else "0.00",
             "rating": booking.rating  # Assuming the rating field exists in the Booking model
         }
-        for booking in bookings
+        for booking in page.items
     ]
-    return render_template('booking_history.html', bookings=booking_data)
+    return render_template('booking_history.html', bookings=booking_data, next_cursor=page.next_cursor)
+
+
+@bp.route('/api/booking_history', methods=['GET'])
+def booking_history_api():
+    # The logged-in user's processed bookings, newest first, one page per request
+    if "user_id" not in session or session.get("user_type") not in ("car_owner", "renter"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    page = keyset_page(BookingHistory.for_user(session["user_type"], session["user_id"]),
+                       [BookingHistory.id], descending=True)
+    results = [
+        {
+            "id": entry.id,
+            "booking_id": entry.booking_id,
+            "location": entry.location,
+            "preferred_date": entry.preferred_date.isoformat() if entry.preferred_date else None,
+            "status": entry.status,
+            "created_at": entry.created_at.isoformat() if entry.created_at else None,
+        }
+        for entry in page.items
+    ]
+    return jsonify({"results": results, "next_cursor": page.next_cursor})
 
 @bp.route("/cancellation_policy", methods=["GET", "POST"])
 def cancellation_policy():
@@ -398,8 +496,9 @@ def cancellation_policy():
         return redirect(url_for("routes.dashboard"))
 
     if request.method == "POST":
-        # Handle the actual cancellation logic
+        # Handle the actual cancellation logic and free the date
         booking.deleted = True
+        release(booking)
         try:
             db.session.commit()
             flash("Booking canceled successfully.", "success")
@@ -437,30 +536,40 @@ def renter_dashboard():
 
     renter_id = session.get("user_id")
     renter = Renter.query.get(renter_id)
-    
-    # Fetch locations and bookings for the renter
-    locations = Location.query.filter_by(renter_id=renter_id).all()
-    bookings = Booking.query.filter_by(renter_id=renter_id).all()
 
-    # Check if any locations are unavailable due to an existing booking
-    unavailable_locations = [location for location in locations if not location.available]
-    
-    # Fetch messages only for approved bookings
-    approved_bookings = [booking for booking in bookings if booking.status.name == "Approved"]
-    approved_booking_ids = [booking.id for booking in approved_bookings]
+    # A "load more" request carries the cursor of one list; only that list is queried
+    locations_page = messages_page = KeysetPage([], None)
+
+    # Fetch the renter's locations, one page at a time
+    if "messages_cursor" not in request.args:
+        locations_page = keyset_page(Location.query.filter_by(renter_id=renter_id), [Location.id],
+                                     cursor_arg="locations_cursor")
 
-    # Fetch messages related to the approved bookings
-    messages = Message.query.filter(
-        (Message.receiver_id == renter_id) & (Message.booking_id.in_(approved_booking_ids))
-    ).order_by(Message.timestamp).all()
+    if "locations_cursor" not in request.args:
+        # Fetch messages only for approved bookings
+        approved_booking_ids = db.session.query(Booking.id).filter(
+            (Booking.renter_id == renter_id) & (Booking.status == BookingStatus.Approved)
+        )
+
+        # Fetch messages related to the approved bookings, newest first
+        messages_page = keyset_page(
+            Message.query.filter(
+                (Message.receiver_id == renter_id) & (Message.receiver_type == "renter") &
+                (Message.booking_id.in_(approved_booking_ids))
+            ).options(
+                db.joinedload(Message.booking).joinedload(Booking.car_owner)
+            ),
+            [Message.timestamp, Message.id], cursor_arg="messages_cursor", descending=True
+        )
 
     return render_template(
         "renter_dashboard.html", 
         renter=renter, 
-        locations=locations, 
-        bookings=bookings, 
-        unavailable_locations=unavailable_locations, 
-        messages=messages
+        locations=locations_page.items, 
+        locations_cursor=locations_page.next_cursor,
+        messages=messages_page.items,
+        messages_cursor=messages_page.next_cursor,
+        cluster_max_zoom=clustering.MAX_ZOOM
     )
 
 
@@ -574,6 +683,35 @@ def toggle_availability_ajax(location_id):
         return jsonify({"success": False, "error": str(e)}), 500
 
 
+@bp.route('/location/<int:location_id>/block_dates', methods=['POST'])
+def block_dates(location_id):
+    # Take a date range off the spot's calendar; bookings already made are kept
+    location = Location.query.get_or_404(location_id)
+    if session.get("user_type") != "renter" or session.get("user_id") != location.renter_id:
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    data = request.get_json(silent=True) or {}
+    try:
+        start, end = availability.parse_date_range(data.get("start") or "", data.get("end"))
+    except ValueError as e:
+        return jsonify({"success": False, "message": f"Invalid date range: {e}"}), 400
+
+    block = AvailabilityBlock(location_id=location.id, start_date=start, end_date=end)
+    db.session.add(block)
+    db.session.commit()
+    return jsonify({"success": True, "id": block.id})
+
+@bp.route('/remove_block/<int:block_id>', methods=['POST'])
+def remove_block(block_id):
+    block = AvailabilityBlock.query.get_or_404(block_id)
+    if session.get("user_type") != "renter" or session.get("user_id") != block.location.renter_id:
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    db.session.delete(block)
+    db.session.commit()
+    return jsonify({"success": True})
+
+
 from flask import request, jsonify
 
 @bp.route('/save_location', methods=['POST'])
@@ -590,7 +728,8 @@ def save_location():
     try:
         renter_id = session.get('user_id')  # Assuming the renter is logged in
         location = Location(renter_id=renter_id, place_name="Pinned Location",
-                            address=f"Lat: {lat}, Lng: {lng}", price=0, amenities="", available=True)
+                            address=f"Lat: {lat}, Lng: {lng}", price=0, amenities="", available=True,
+                            lat=float(lat), lng=float(lng))
         db.session.add(location)
         db.session.commit()
         return jsonify({"success": True, "message": "Location saved successfully!"})
@@ -695,6 +834,7 @@ def renter_profile():
     return render_template("renter_profile.html", user=user)
 
 @bp.route("/renter/bookings", methods=["GET"])
+@cache.cached_view(depends_on=[Booking, Location, Renter])
 def renter_bookings():
     if "user_id" not in session or session.get("user_type") != "renter":
         flash("Access denied. Please log in as a renter.", "danger")
@@ -702,50 +842,237 @@ def renter_bookings():
 
     renter_id = session.get("user_id")
     renter = Renter.query.get(renter_id)  # Fetch renter details
-    bookings = Booking.query.filter_by(renter_id=renter_id).all()
+    page = keyset_page(Booking.listing_query().filter_by(renter_id=renter_id),
+                       [Booking.created_at, Booking.id], descending=True)
+
+    return render_template("renter_bookings.html", renter=renter, bookings=page.items, next_cursor=page.next_cursor)
+
+
+
+
+def serialize_location(location):
+    return {
+        "id": location.id,
+        "place_name": location.place_name,
+        "address": location.address,
+        "price": location.price,
+        "amenities": location.amenities,
+        "amenity_keys": amenity_vocabulary.keys(location.amenity_mask or 0),
+        "available": location.available,
+        "lat": location.lat,
+        "lng": location.lng
+    }
+
+
+@cache.memoize(depends_on=[Location])
+def available_locations_data():
+    # Location cards on the car owner dashboard when no search is active
+    if location_snapshot.enabled:
+        columns = location_snapshot.columns()
+        return columns.rows(columns.select())
+    return [serialize_location(location) for location in Location.query.filter_by(available=True).all()]
+
+
+def location_criteria():
+    # The optional ?amenities=, dates (?start=&end=) and viewport
+    # (?bbox=south,west,north,east) or circle (?lat=&lng=&radius=km) filters
+    criteria = {"mask": requested_amenities(), "dates": requested_dates(), "bbox": None, "center": None}
+    if request.args.get("bbox"):
+        criteria["bbox"] = spatial.parse_bbox(request.args["bbox"])
+    elif request.args.get("radius"):
+        lat = float(request.args["lat"])
+        lng = float(request.args["lng"])
+        radius = float(request.args["radius"])
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius <= 0:
+            raise ValueError("lat, lng or radius is out of range")
+        criteria["center"] = (lat, lng, radius)
+    return criteria
+
+
+def filtered_locations():
+    # Available spots matching location_criteria(). Returns (query, center, amenity
+    # mask); rows of a circle query still have to be checked against its
+    # (lat, lng, radius) center
+    criteria = location_criteria()
+    query = Location.query.filter_by(available=True)
+    if criteria["mask"]:
+        query = query.filter(amenity_vocabulary.has_all(Location, criteria["mask"]))
+    if criteria["dates"]:
+        query = query.filter(availability.free_between(Location, *criteria["dates"]))
+    if criteria["bbox"]:
+        query = query.filter(spatial.within_bbox(Location, *criteria["bbox"]))
+    elif criteria["center"]:
+        query = query.filter(spatial.within_bbox(Location, *spatial.bbox_for_radius(*criteria["center"])))
+    return query, criteria["center"], criteria["mask"]
 
-    return render_template("renter_bookings.html", renter=renter, bookings=bookings)
 
+@bp.route("/api/locations", methods=["GET"])
+@versioned_cache.cached(LOCATIONS)
+def get_locations():
+    # Spots matching filtered_locations(), streamed as a JSON array or, with
+    # ?format=ndjson, one object per line
+    output_format = request.args.get("format", "json")
+    if output_format not in FORMATS:
+        return jsonify({"error": f"Unsupported format: {output_format}"}), 400
 
+    try:
+        criteria = location_criteria()
+        if not criteria["dates"] and location_snapshot.enabled:
+            # Everything but the dates can be answered from the in-memory columns
+            columns = location_snapshot.columns()
+            positions = columns.select(criteria["bbox"], criteria["center"], criteria["mask"])
+            rows = columns.iter_rows(positions, current_app.config["STREAM_BATCH_SIZE"])
+            return stream_response(rows, lambda row: row, output_format)
+        query, center, mask = filtered_locations()
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid spatial query: {e}"}), 400
+
+    locations = query.order_by(Location.id).yield_per(current_app.config["STREAM_BATCH_SIZE"])
+    if center:
+        lat, lng, radius = center
+        locations = (location for location in locations
+                     if spatial.haversine_km(lat, lng, location.lat, location.lng) <= radius)
+
+    return stream_response(locations, serialize_location, output_format)
+
+@bp.route("/api/locations/facets", methods=["GET"])
+@versioned_cache.cached(LOCATIONS)
+def location_facets():
+    # Number of spots matching the same filters as /api/locations, in total and
+    # per amenity, for drilling down with ?amenities=
+    try:
+        query, center, mask = filtered_locations()
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid spatial query: {e}"}), 400
+
+    if center:
+        # Only the circle's bounding box is known to SQL, so count the rows inside the circle here
+        lat, lng, radius = center
+        counts, total = {}, 0
+        for location_lat, location_lng, location_mask in query.with_entities(
+                Location.lat, Location.lng, Location.amenity_mask):
+            if spatial.haversine_km(lat, lng, location_lat, location_lng) <= radius:
+                total += 1
+                for key in amenity_vocabulary.keys(location_mask):
+                    counts[key] = counts.get(key, 0) + 1
+    else:
+        counts = amenity_vocabulary.facet_counts(query.with_entities(Location.id).scalar_subquery())
+        total = query.count()
 
+    return jsonify({"total": total, "amenities": amenity_vocabulary.facets(counts, mask)})
 
-@bp.route("/api/locations", methods=["GET"])
-def get_locations():
-    locations = Location.query.filter_by(available=True).all()
-    locations_data = [
-        {
-            "id": location.id,
-            "place_name": location.place_name,
-            "address": location.address,
-            "price": location.price,
-            "amenities": location.amenities,
-            "available": location.available,
-            "lat": location.lat,
-            "lng": location.lng
-        }
-        for location in locations
-    ]
-    return jsonify(locations_data)
+@bp.route("/api/locations/clusters", methods=["GET"])
+@versioned_cache.cached(LOCATIONS)
+def location_clusters():
+    # Pre-aggregated clusters of available spots in ?bbox=south,west,north,east at map
+    # ?zoom=; the payload grows with the viewport, not with the number of spots.
+    # Past max_zoom the map should switch to /api/locations?bbox= markers
+    try:
+        south, west, north, east = spatial.parse_bbox(request.args["bbox"])
+        zoom = int(request.args["zoom"])
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid cluster query: {e}"}), 400
+    return jsonify({
+        "zoom": min(max(zoom, clustering.MIN_ZOOM), clustering.MAX_ZOOM),
+        "max_zoom": clustering.MAX_ZOOM,
+        "clusters": clustering.clusters(south, west, north, east, zoom),
+    })
+
+@bp.route("/api/locations/nearest", methods=["GET"])
+@versioned_cache.cached(LOCATIONS)
+def nearest_locations():
+    # k closest available spots to ?lat=&lng=, optionally capped by ?max_price=,
+    # limited to spots free from ?start= to ?end= and offering ?amenities=
+    try:
+        dates = requested_dates()
+        mask = requested_amenities()
+        lat = float(request.args["lat"])
+        lng = float(request.args["lng"])
+        k = int(request.args.get("k", 10))
+        max_price = request.args.get("max_price", type=float)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError("lat or lng is out of range")
+        if not 1 <= k <= 100:
+            raise ValueError("k must be between 1 and 100")
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid nearest query: {e}"}), 400
+
+    if not dates and location_snapshot.enabled:
+        columns = location_snapshot.columns()
+        results = []
+        for distance, position in columns.nearest(lat, lng, k, mask, max_price):
+            location_data = columns.rows([position])[0]
+            location_data["distance_km"] = round(distance, 3)
+            results.append(location_data)
+        return jsonify(results)
+
+    query = Location.query.filter_by(available=True)
+    if max_price is not None:
+        query = query.filter(Location.price <= max_price)
+    if dates:
+        query = query.filter(availability.free_between(Location, *dates))
+    if mask:
+        query = query.filter(amenity_vocabulary.has_all(Location, mask))
+
+    results = []
+    for distance, location in spatial.nearest(query, Location, lat, lng, k):
+        location_data = serialize_location(location)
+        location_data["distance_km"] = round(distance, 3)
+        results.append(location_data)
+    return jsonify(results)
+
+@bp.route("/api/locations/<int:location_id>/calendar", methods=["GET"])
+@versioned_cache.cached(LOCATIONS)
+def location_calendar(location_id):
+    # Booked dates and blocked intervals of one spot from ?start= to ?end=
+    Location.query.get_or_404(location_id)
+    try:
+        dates = requested_dates()
+        if not dates:
+            raise ValueError("start is required")
+    except ValueError as e:
+        return jsonify({"error": f"Invalid date range: {e}"}), 400
+    return jsonify(availability.calendar(location_id, *dates))
+
+@bp.route("/api/locations/search", methods=["GET"])
+@versioned_cache.cached(LOCATIONS)
+def search_locations():
+    search_query = request.args.get("q", "").strip()
+    if not search_query:
+        return jsonify({"error": "Missing search query."}), 400
+
+    pagination = location_search.filter(
+        Location.query.filter_by(available=True), search_query
+    ).paginate(
+        page=request.args.get("page", 1, type=int),
+        per_page=current_app.config["SEARCH_PER_PAGE"],
+        error_out=False
+    )
+    return jsonify({
+        "results": [serialize_location(location) for location in pagination.items],
+        "page": pagination.page,
+        "pages": pagination.pages,
+        "total": pagination.total
+    })
 
 @bp.route("/api/all_locations", methods=["GET"])
+@versioned_cache.cached(LOCATIONS)
 def all_locations():
-    locations = Location.query.filter_by(available=True).all()
+    # ?format=json or ?format=ndjson streams every available location in one response
+    output_format = request.args.get("format")
+    if output_format:
+        if output_format not in FORMATS:
+            return jsonify({"error": f"Unsupported format: {output_format}"}), 400
+        locations = Location.query.filter_by(available=True).order_by(Location.id).yield_per(
+            current_app.config["STREAM_BATCH_SIZE"]
+        )
+        return stream_response(locations, serialize_location, output_format)
 
-    locations_data = [
-        {
-            "id": location.id,
-            "place_name": location.place_name,
-            "address": location.address,
-            "price": location.price,
-            "amenities": location.amenities,
-            "available": location.available,
-            "lat": location.lat,
-            "lng": location.lng
-        }
-        for location in locations
-    ]
+    page = keyset_page(Location.query.filter_by(available=True), [Location.id])
+
+    locations_data = [serialize_location(location) for location in page.items]
 
-    return jsonify(locations_data)
+    return jsonify({"results": locations_data, "next_cursor": page.next_cursor})
 
 
 @bp.route('/send_message', methods=['POST'])
@@ -785,7 +1112,9 @@ def send_message():
     # Create and save the message
     new_message = Message(
         sender_id=sender_id,
+        sender_type=session.get("user_type"),
         receiver_id=receiver_id,
+        receiver_type=other_participant_type(session.get("user_type")),
         message_content=message_content,
         booking_id=booking_id
     )
@@ -818,7 +1147,7 @@ def reply_message(message_id):
         return redirect(url_for('routes.renter_dashboard'))  # Redirect to dashboard if message not found
 
     # Ensure the user is replying to a message they received
-    if original_message.receiver_id != sender_id:
+    if original_message.receiver_id != sender_id or original_message.receiver_type != session.get("user_type"):
         flash("You can only reply to messages sent to you.", "danger")
         return redirect(url_for('routes.renter_dashboard'))  # Redirect to dashboard if unauthorized
 
@@ -829,7 +1158,9 @@ def reply_message(message_id):
     # Create and save the reply message
     new_reply = Message(
         sender_id=sender_id,
+        sender_type=original_message.receiver_type,
         receiver_id=receiver_id,
+        receiver_type=original_message.sender_type,
         message_content=reply_message_content,
         booking_id=booking_id
     )
@@ -861,18 +1192,88 @@ def view_messages(booking_id):
         flash("You are not authorized to view messages for this booking.", "danger")
         return redirect(url_for('routes.renter_dashboard'))
     
-    # Fetch all messages related to this booking, ordered by the creation date
-    messages = Message.query.filter_by(booking_id=booking_id).order_by(Message.timestamp).all()
+    # Fetch the latest page of messages for this booking, shown oldest first
+    page = keyset_page(Message.query.filter_by(booking_id=booking_id), MESSAGE_ORDER, descending=True)
+    messages = Message.load_participants(page.items[::-1])
+
+    # Opening the thread reads everything sent to this user on it
+    if not request.args.get("cursor"):
+        inbox.mark_read(session.get("user_type"), sender_id, booking_id)
+        db.session.commit()
+
+    # Where the page's incremental sync continues from: the last message saved
+    latest_cursor = row_cursor(max(messages, key=lambda message: message.id), MESSAGE_SYNC_ORDER) if messages else None
 
     # Render the view messages page with the messages
     return render_template(
         'messages.html', 
         messages=messages, 
+        next_cursor=page.next_cursor,
+        latest_cursor=latest_cursor,
         booking=booking,
         user_id=sender_id,
+        user_type=session.get("user_type"),
         car_owner=booking.car_owner,
         renter=booking.renter
     )
+def serialize_message(message):
+    return {
+        "id": message.id,
+        "booking_id": message.booking_id,
+        "sender_id": message.sender_id,
+        "sender_type": message.sender_type,
+        "receiver_id": message.receiver_id,
+        "receiver_type": message.receiver_type,
+        "message_content": message.message_content,
+        "timestamp": message.timestamp.isoformat() if message.timestamp else None,
+    }
+
+@bp.route('/api/messages/<int:booking_id>', methods=['GET'])
+def messages_since(booking_id):
+    # Messages saved after ?after= (the page's latest_cursor or a previous
+    # response's cursor), in the order they were saved, so a reconnecting client
+    # only fetches what it missed
+    booking = Booking.query.get_or_404(booking_id)
+    participant = (session.get("user_type"), session.get("user_id"))
+    if participant not in (("car_owner", booking.car_owner_id), ("renter", booking.renter_id)):
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    page = keyset_page(Message.query.filter_by(booking_id=booking_id), MESSAGE_SYNC_ORDER, cursor_arg="after")
+    if page.items:
+        inbox.mark_read(*participant, booking_id)
+        db.session.commit()
+    return jsonify({
+        "messages": [serialize_message(message) for message in page.items],
+        "cursor": row_cursor(page.items[-1], MESSAGE_SYNC_ORDER) if page.items else request.args.get("after"),
+        "has_more": page.has_more,
+    })
+
+@bp.route('/api/inbox', methods=['GET'])
+def inbox_api():
+    # The logged-in user's conversations, most recent first, with unread counts
+    if "user_id" not in session or session.get("user_type") not in ("car_owner", "renter"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    page = keyset_page(
+        InboxSummary.query.filter_by(user_type=session["user_type"], user_id=session["user_id"]),
+        [InboxSummary.last_message_at, InboxSummary.booking_id], descending=True
+    )
+    return jsonify({
+        "results": [inbox.serialize_summary(summary) for summary in page.items],
+        "next_cursor": page.next_cursor,
+    })
+
+@bp.route('/api/inbox/unread', methods=['GET'])
+def inbox_unread():
+    # Badge count: a sum over the user's conversations, never over messages
+    if "user_id" not in session or session.get("user_type") not in ("car_owner", "renter"):
+        return jsonify({"success": False, "message": "Unauthorized"}), 403
+
+    unread = db.session.query(db.func.coalesce(db.func.sum(InboxSummary.unread_count), 0)).filter_by(
+        user_type=session["user_type"], user_id=session["user_id"]
+    ).scalar()
+    return jsonify({"unread": unread})
+
 @bp.route("/logout")
 def logout():
     session.clear()
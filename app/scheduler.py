@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+log = logging.getLogger(__name__)
+
+
+class MemoryJobStore:
+    """Job state in this process only; every process runs every job."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def claim(self, name, interval, now):
+        with self._lock:
+            job = self._jobs.setdefault(name, {"name": name, "next_run_at": None, "last_started_at": None,
+                                               "last_duration_ms": None, "last_rows": None, "last_error": None,
+                                               "run_count": 0, "total_rows": 0})
+            if job["next_run_at"] is not None and job["next_run_at"] > now:
+                return False
+            job["next_run_at"] = now + timedelta(seconds=interval)
+            job["last_started_at"] = now
+            return True
+
+    def record(self, name, duration_ms, rows, error=None):
+        with self._lock:
+            job = self._jobs[name]
+            job.update(last_duration_ms=duration_ms, last_rows=rows, last_error=error)
+            job["run_count"] += 1
+            job["total_rows"] += rows or 0
+
+    def stats(self):
+        with self._lock:
+            return [dict(job) for job in self._jobs.values()]
+
+
+class DatabaseJobStore:
+    """Job state in the ``scheduled_job`` table, shared by every process on the database.
+
+    A run is claimed with a conditional UPDATE that moves ``next_run_at``
+    forward, so however many workers poll, each due run happens exactly once.
+    """
+
+    def claim(self, name, interval, now):
+        from . import db
+        from .models import ScheduledJob
+        table = ScheduledJob.__table__
+        next_run_at = now + timedelta(seconds=interval)
+        result = db.session.execute(
+            update(table)
+            .where(table.c.name == name, or_(table.c.next_run_at.is_(None), table.c.next_run_at <= now))
+            .values(next_run_at=next_run_at, last_started_at=now)
+        )
+        if result.rowcount == 0:
+            if db.session.get(ScheduledJob, name) is not None:
+                db.session.rollback()
+                return False
+            db.session.add(ScheduledJob(name=name, next_run_at=next_run_at, last_started_at=now,
+                                        run_count=0, total_rows=0))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another process registered the job first and owns this run
+            db.session.rollback()
+            return False
+        return True
+
+    def record(self, name, duration_ms, rows, error=None):
+        from . import db
+        from .models import ScheduledJob
+        table = ScheduledJob.__table__
+        db.session.execute(
+            update(table).where(table.c.name == name).values(
+                last_duration_ms=duration_ms,
+                last_rows=rows,
+                last_error=error,
+                run_count=table.c.run_count + 1,
+                total_rows=table.c.total_rows + (rows or 0),
+            )
+        )
+        db.session.commit()
+
+    def stats(self):
+        from .models import ScheduledJob
+        return [
+            {column.name: getattr(job, column.name) for column in ScheduledJob.__table__.columns}
+            for job in ScheduledJob.query.order_by(ScheduledJob.name)
+        ]
+
+
+JOB_STORES = {
+    "database": DatabaseJobStore,
+    "memory": MemoryJobStore,
+}
+
+
+class Scheduler:
+    """Runs registered jobs at fixed intervals on a daemon thread.
+
+    Each job returns the number of rows it touched; its latency, row count and
+    last error are recorded in the job store.
+    """
+
+    def __init__(self, app=None):
+        self.jobs = {}
+        self._thread = None
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SCHEDULER_JOBSTORE", "database")
+        app.config.setdefault("SCHEDULER_TICK", 30)
+        store = app.config["SCHEDULER_JOBSTORE"]
+        if store not in JOB_STORES:
+            raise ValueError(f"Unknown SCHEDULER_JOBSTORE {store!r}")
+        app.extensions["scheduler"] = JOB_STORES[store]()
+
+    def add_job(self, name, func, interval):
+        # ``interval`` in seconds
+        self.jobs[name] = (func, interval)
+
+    def run_pending(self, app):
+        # Run every due job once; called on each tick of the scheduler thread
+        store = app.extensions["scheduler"]
+        for name, (func, interval) in list(self.jobs.items()):
+            with app.app_context():
+                from . import db
+                try:
+                    if store.claim(name, interval, datetime.utcnow()):
+                        self._run(store, name, func)
+                except Exception:
+                    log.exception("Scheduler could not run job %s", name)
+                finally:
+                    db.session.remove()
+
+    def _run(self, store, name, func):
+        from . import db
+        started = time.perf_counter()
+        rows, error = None, None
+        try:
+            rows = func()
+        except Exception as e:
+            db.session.rollback()
+            error = repr(e)
+            log.exception("Job %s failed", name)
+        duration_ms = (time.perf_counter() - started) * 1000
+        store.record(name, duration_ms, rows, error)
+        log.info("Job %s touched %s rows in %.1f ms", name, rows, duration_ms)
+
+    def stats(self, app):
+        with app.app_context():
+            return app.extensions["scheduler"].stats()
+
+    def start(self, app):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        tick = app.config["SCHEDULER_TICK"]
+
+        def loop():
+            while not self._stop.is_set():
+                self.run_pending(app)
+                self._stop.wait(tick)
+
+        self._thread = threading.Thread(target=loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
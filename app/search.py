@@ -0,0 +1,150 @@
+import logging
+import re
+
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy import event, func, inspect, text
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(search_query):
+    return TOKEN_RE.findall(search_query.lower())
+
+
+class LikeBackend:
+    """Substring match on place name and address; works everywhere but scans the table."""
+
+    name = "like"
+
+    def apply(self, query, model, search_query):
+        pattern = f"%{search_query}%"
+        return query.filter(model.place_name.ilike(pattern) | model.address.ilike(pattern))
+
+    def index(self, connection, target):
+        pass
+
+    def remove(self, connection, target):
+        pass
+
+
+class SQLiteFTSBackend:
+    """FTS5 table ``location_fts`` keyed by location id, kept in sync by model events."""
+
+    name = "sqlite_fts"
+    table = sa.table("location_fts", sa.column("rowid"), sa.column("rank"))
+
+    def apply(self, query, model, search_query):
+        terms = search_terms(search_query)
+        if not terms:
+            return query.filter(sa.false())
+
+        # Every term must match, and the last one may be a partial word
+        match = " ".join('"%s"' % term for term in terms[:-1])
+        match = f'{match} "{terms[-1]}"*'.strip()
+        return (
+            query.join(self.table, self.table.c.rowid == model.id)
+            .filter(text("location_fts MATCH :fts_match").bindparams(fts_match=match))
+            .order_by(self.table.c.rank, model.id)
+        )
+
+    def index(self, connection, target):
+        self.remove(connection, target)
+        connection.execute(
+            text("INSERT INTO location_fts (rowid, place_name, address) VALUES (:id, :place_name, :address)"),
+            {"id": target.id, "place_name": target.place_name, "address": target.address},
+        )
+
+    def remove(self, connection, target):
+        connection.execute(text("DELETE FROM location_fts WHERE rowid = :id"), {"id": target.id})
+
+
+class PostgresBackend:
+    """``tsvector`` match served by the GIN expression index from the migration."""
+
+    name = "postgres"
+
+    def document(self, model):
+        # Must stay identical to the indexed expression in the migration
+        return func.to_tsvector(
+            "simple", func.coalesce(model.place_name, "") + " " + func.coalesce(model.address, "")
+        )
+
+    def apply(self, query, model, search_query):
+        terms = search_terms(search_query)
+        if not terms:
+            return query.filter(sa.false())
+
+        document = self.document(model)
+        tsquery = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        return query.filter(document.op("@@")(tsquery)).order_by(
+            func.ts_rank(document, tsquery).desc(), model.id
+        )
+
+    # The expression index is maintained by Postgres itself
+    def index(self, connection, target):
+        pass
+
+    def remove(self, connection, target):
+        pass
+
+
+BACKENDS = {backend.name: backend for backend in (LikeBackend, SQLiteFTSBackend, PostgresBackend)}
+
+
+class LocationSearch:
+    """Full-text search over ``Location`` with a backend chosen by ``SEARCH_BACKEND``.
+
+    ``auto`` picks FTS5 on SQLite (once its migration has been applied), tsvector on
+    Postgres and plain substring matching anywhere else.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("SEARCH_BACKEND", "auto")
+        app.extensions["location_search"] = {"backend": None}
+
+        from .models import Location
+        for identifier, listener in (("after_insert", self._after_insert),
+                                     ("after_update", self._after_update),
+                                     ("after_delete", self._after_delete)):
+            if not event.contains(Location, identifier, listener):
+                event.listen(Location, identifier, listener)
+
+    def backend(self):
+        state = current_app.extensions["location_search"]
+        if state["backend"] is None:
+            state["backend"] = self._resolve_backend(current_app.config["SEARCH_BACKEND"])
+        return state["backend"]
+
+    def _resolve_backend(self, name):
+        if name != "auto":
+            return BACKENDS[name]()
+
+        from . import db
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            return PostgresBackend()
+        if dialect == "sqlite":
+            if inspect(db.engine).has_table("location_fts"):
+                return SQLiteFTSBackend()
+            logging.warning("location_fts table is missing; run the migrations to enable full-text search")
+        return LikeBackend()
+
+    def filter(self, query, search_query):
+        from .models import Location
+        return self.backend().apply(query, Location, search_query)
+
+    def _after_insert(self, mapper, connection, target):
+        self.backend().index(connection, target)
+
+    def _after_update(self, mapper, connection, target):
+        state = inspect(target)
+        if state.attrs.place_name.history.has_changes() or state.attrs.address.history.has_changes():
+            self.backend().index(connection, target)
+
+    def _after_delete(self, mapper, connection, target):
+        self.backend().remove(connection, target)
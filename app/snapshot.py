@@ -0,0 +1,263 @@
+import sys
+import threading
+from itertools import chain
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from . import amenities as amenity_vocabulary
+from .spatial import EARTH_RADIUS_KM
+from .versioning import LOCATIONS, current_version, tracked_models
+
+# String fields kept per location, as indexes into a shared pool of interned strings
+STRING_FIELDS = ("place_name", "address", "amenities")
+
+
+class Columns:
+    """Immutable column arrays of the available locations, sorted by id.
+
+    Updates build a new instance, so a reader keeps a consistent view for as
+    long as it holds one.
+    """
+
+    def __init__(self, ids, lat, lng, price, amenity_mask, strings, pool):
+        self.ids = ids
+        self.lat = lat
+        self.lng = lng
+        self.price = price
+        self.amenity_mask = amenity_mask
+        self.strings = strings  # {field: int32 array of indexes into pool}
+        self.pool = pool
+
+    def __len__(self):
+        return len(self.ids)
+
+    def select(self, bbox=None, center=None, amenity_mask=0, max_price=None):
+        """Positions of the rows inside ``bbox`` (south, west, north, east) or the
+        ``center`` (lat, lng, radius_km) circle, offering every amenity in
+        ``amenity_mask`` and priced at most ``max_price``, in id order."""
+        keep = np.ones(len(self.ids), dtype=bool)
+        if amenity_mask:
+            keep &= (self.amenity_mask & amenity_mask) == amenity_mask
+        if max_price is not None:
+            keep &= self.price <= max_price
+        if bbox is not None:
+            south, west, north, east = bbox
+            keep &= (self.lat >= south) & (self.lat <= north)
+            if west > east:
+                keep &= (self.lng >= west) | (self.lng <= east)
+            else:
+                keep &= (self.lng >= west) & (self.lng <= east)
+        positions = np.flatnonzero(keep)
+        if center is not None:
+            lat, lng, radius = center
+            positions = positions[self.distances(lat, lng, positions) <= radius]
+        return positions
+
+    def distances(self, lat, lng, positions):
+        # Haversine distance in km from the point to each row at ``positions``
+        lat1, lng1 = np.radians(lat), np.radians(lng)
+        lat2, lng2 = np.radians(self.lat[positions]), np.radians(self.lng[positions])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+    def nearest(self, lat, lng, k, amenity_mask=0, max_price=None):
+        # Up to k (distance_km, position) pairs closest to the point, nearest first
+        positions = self.select(amenity_mask=amenity_mask, max_price=max_price)
+        distances = self.distances(lat, lng, positions)
+        if len(positions) > k:
+            closest = np.argpartition(distances, k - 1)[:k]
+            positions, distances = positions[closest], distances[closest]
+        order = np.lexsort((self.ids[positions], distances))
+        return list(zip(distances[order].tolist(), positions[order].tolist()))
+
+    def rows(self, positions):
+        # Plain dicts shaped like routes.serialize_location, without any ORM objects
+        strings = {field: [self.pool[i] for i in self.strings[field][positions].tolist()]
+                   for field in STRING_FIELDS}
+        masks = self.amenity_mask[positions].tolist()
+        return [
+            {
+                "id": location_id,
+                "place_name": strings["place_name"][n],
+                "address": strings["address"][n],
+                "price": price,
+                "amenities": strings["amenities"][n],
+                "amenity_keys": amenity_vocabulary.keys(masks[n]),
+                "available": True,
+                "lat": lat,
+                "lng": lng,
+            }
+            for n, (location_id, price, lat, lng) in enumerate(zip(
+                self.ids[positions].tolist(), self.price[positions].tolist(),
+                self.lat[positions].tolist(), self.lng[positions].tolist(),
+            ))
+        ]
+
+    def iter_rows(self, positions, batch_size):
+        # rows() a batch at a time, for streaming responses
+        for start in range(0, len(positions), batch_size):
+            yield from self.rows(positions[start:start + batch_size])
+
+
+def _fetch(connection, ids=None):
+    # Column tuples of available locations, all of them or just ``ids``
+    from .models import Location
+    query = select(Location.id, Location.lat, Location.lng, Location.price, Location.amenity_mask,
+                   *[getattr(Location, field) for field in STRING_FIELDS]).where(Location.available == True)  # noqa: E712
+    if ids is not None:
+        query = query.where(Location.id.in_(ids))
+    return connection.execute(query.order_by(Location.id)).all()
+
+
+def _build(rows, pool=None, base=None, drop_ids=()):
+    # New Columns from ``rows`` plus the rows of ``base`` whose ids are not in ``drop_ids``
+    pool = list(pool or [None])
+    index = {value: i for i, value in enumerate(pool)}
+
+    def intern(value):
+        if value not in index:
+            index[value] = len(pool)
+            pool.append(sys.intern(value) if isinstance(value, str) else value)
+        return index[value]
+
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    lat = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+    lng = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+    price = np.fromiter((row[3] or 0 for row in rows), dtype=np.float64, count=len(rows))
+    mask = np.fromiter((row[4] or 0 for row in rows), dtype=np.int64, count=len(rows))
+    strings = {field: np.fromiter((intern(row[5 + n]) for row in rows), dtype=np.int32, count=len(rows))
+               for n, field in enumerate(STRING_FIELDS)}
+
+    if base is not None:
+        keep = ~np.isin(base.ids, np.fromiter(drop_ids, dtype=np.int64))
+        ids = np.concatenate([base.ids[keep], ids])
+        lat = np.concatenate([base.lat[keep], lat])
+        lng = np.concatenate([base.lng[keep], lng])
+        price = np.concatenate([base.price[keep], price])
+        mask = np.concatenate([base.amenity_mask[keep], mask])
+        strings = {field: np.concatenate([base.strings[field][keep], strings[field]]) for field in STRING_FIELDS}
+        order = np.argsort(ids, kind="stable")
+        ids, lat, lng, price, mask = ids[order], lat[order], lng[order], price[order], mask[order]
+        strings = {field: values[order] for field, values in strings.items()}
+
+        # Drop strings no row refers to any more, so a long run of patches
+        # without a full reload cannot grow the pool without bound
+        used = np.unique(np.concatenate(list(strings.values())))
+        if len(used) < len(pool):
+            pool = [pool[i] for i in used.tolist()]
+            strings = {field: np.searchsorted(used, values).astype(np.int32) for field, values in strings.items()}
+
+    return Columns(ids, lat, lng, price, mask, strings, pool)
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.columns = None
+        self.version = None  # data version of LOCATIONS the columns reflect
+        self.pending = set()  # ids committed here since, still to be re-read
+
+
+def _changed_locations(session):
+    # Flushed objects that bump the LOCATIONS version, and the Location ids among them
+    changed = list(chain(session.new, session.deleted))
+    changed += [obj for obj in session.dirty if session.is_modified(obj)]
+    tracked = [obj for obj in changed if isinstance(obj, tracked_models()[LOCATIONS])]
+    from .models import Location
+    return tracked, {obj.id for obj in tracked if isinstance(obj, Location)}
+
+
+def _record_flush(session, flush_context):
+    # Runs after versioning.bump_versions in the same flush: this transaction
+    # now holds the bumped LOCATIONS counter, so the value read here is exactly
+    # one past the previous version
+    tracked, ids = _changed_locations(session)
+    if not tracked:
+        return
+    from .models import DataVersion
+    version = session.connection().execute(
+        select(DataVersion.version).where(DataVersion.name == LOCATIONS)
+    ).scalar()
+    changes = session.info.setdefault("location_snapshot", {"ids": set(), "stale": False})
+    changes.setdefault("from_version", version - 1)
+    changes["to_version"] = version
+    changes["ids"] |= ids
+
+
+def _record_bulk(orm_execute_state):
+    # Set-based statements on location data can't be replayed row by row
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = orm_execute_state.statement.table
+    if any(model.__table__.name == table.name for model in tracked_models()[LOCATIONS]):
+        orm_execute_state.session.info.setdefault("location_snapshot", {"ids": set()})["stale"] = True
+
+
+def _apply_commit(session):
+    changes = session.info.pop("location_snapshot", None)
+    if not changes or not has_app_context() or "location_snapshot" not in current_app.extensions:
+        return
+    state = current_app.extensions["location_snapshot"]
+    with state.lock:
+        if state.columns is None:
+            return
+        if changes["stale"] or state.version != changes.get("from_version"):
+            # Changed elsewhere too (or in bulk): reload on the next read
+            state.columns = None
+            return
+        state.version = changes["to_version"]
+        state.pending |= changes["ids"]
+
+
+def _discard(session):
+    session.info.pop("location_snapshot", None)
+
+
+class LocationSnapshot:
+    """Process-local columnar copy of the available locations.
+
+    Reads check the LOCATIONS data version (one primary key lookup) and serve
+    vectorized filters over NumPy arrays instead of loading ``Location``
+    objects. Commits made in this process are applied incrementally, by
+    re-reading only the rows they touched; a version moved by any other
+    process or by a bulk statement triggers a full reload.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("LOCATION_SNAPSHOT", True)
+        app.extensions["location_snapshot"] = _State()
+        # Registered after VersionedCache.init_app, so _record_flush sees the bumped version
+        for identifier, listener in (("after_flush", _record_flush),
+                                     ("do_orm_execute", _record_bulk),
+                                     ("after_commit", _apply_commit),
+                                     ("after_rollback", _discard)):
+            if not event.contains(Session, identifier, listener):
+                event.listen(Session, identifier, listener)
+
+    @property
+    def enabled(self):
+        return current_app.config["LOCATION_SNAPSHOT"]
+
+    def columns(self):
+        """Current ``Columns``, reloaded or patched from the database as needed."""
+        from . import db
+        state = current_app.extensions["location_snapshot"]
+        version = current_version(LOCATIONS)
+        with state.lock:
+            connection = db.session.connection()
+            if state.columns is None or state.version != version:
+                state.columns = _build(_fetch(connection))
+                state.version = version
+                state.pending = set()
+            elif state.pending:
+                ids = state.pending
+                state.columns = _build(_fetch(connection, ids), state.columns.pool, state.columns, ids)
+                state.pending = set()
+            return state.columns
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+from flask import session
+from flask_socketio import emit, join_room, leave_room
+
+from . import db, message_writer, socketio
+from .inbox import user_room
+from .message_writer import WriterFull
+from .models import Booking, other_participant_type
+
+# Chat events; each booking's conversation is the room booking_<id>. With a
+# SOCKETIO_MESSAGE_QUEUE configured, emits to a room reach the clients of
+# every worker process, not just this one.
+
+
+def _current_user():
+    # (user_type, user_id) of the logged-in user, or None
+    if session.get("user_id") and session.get("user_type") in ("car_owner", "renter"):
+        return session["user_type"], session["user_id"]
+    return None
+
+
+def _participant_booking(data):
+    # The booking named by data["booking_id"] if the current user is one of its
+    # participants, as in routes.messages_since; None for anything else
+    try:
+        booking_id = int(data["booking_id"])
+    except (TypeError, KeyError, ValueError):
+        return None
+    booking = db.session.get(Booking, booking_id)
+    if booking is None or _current_user() not in (("car_owner", booking.car_owner_id),
+                                                    ("renter", booking.renter_id)):
+        return None
+    return booking
+
+
+def _error(data, message):
+    # Tell the sender what was refused instead of raising in the handler
+    booking_id = data.get('booking_id') if isinstance(data, dict) else None
+    emit('message_error', {'booking_id': booking_id, 'message': message})
+
+
+@socketio.on('connect')
+def handle_connect():
+    # Only logged-in users may connect; each connection also listens for the
+    # user's inbox_update events
+    user = _current_user()
+    if user is None:
+        return False
+    join_room(user_room(*user))
+
+@socketio.on('send_message')
+def handle_send_message(data):
+    # The sender comes from the session and the receiver from the booking;
+    # only the booking id and the text are taken from the client
+    booking = _participant_booking(data)
+    if booking is None:
+        _error(data, "You are not part of this booking.")
+        return
+    message_content = data.get('message_content')
+    if not isinstance(message_content, str) or not message_content.strip():
+        _error(data, "The message is empty.")
+        return
+
+    sender_type, sender_id = _current_user()
+    receiver_type = other_participant_type(sender_type)
+    receiver_id = booking.renter_id if receiver_type == 'renter' else booking.car_owner_id
+    timestamp = datetime.utcnow()
+
+    # Queue the message for the batched writer rather than committing here
+    try:
+        message_writer.submit(
+            sender_id=sender_id,
+            sender_type=sender_type,
+            receiver_id=receiver_id,
+            receiver_type=receiver_type,
+            message_content=message_content,
+            booking_id=booking.id,
+            timestamp=timestamp,
+            read_status=False,
+        )
+    except (WriterFull, ValueError) as e:
+        emit('message_error', {'booking_id': booking.id, 'message': str(e)})
+        return
+
+    # Emit the message to the receiver only once the writer has accepted it
+    emit('receive_message', {
+        'sender_id': sender_id,
+        'sender_type': sender_type,
+        'receiver_id': receiver_id,
+        'message_content': message_content,
+        'timestamp': timestamp.isoformat(),
+        'booking_id': booking.id
+    }, room=f'booking_{booking.id}')
+
+@socketio.on('join_room')
+def handle_join_room(data):
+    booking = _participant_booking(data)
+    if booking is None:
+        _error(data, "You are not part of this booking.")
+        return
+    join_room(f'booking_{booking.id}')
+
+@socketio.on('leave_room')
+def handle_leave_room(data):
+    try:
+        booking_id = int(data['booking_id'])
+    except (TypeError, KeyError, ValueError):
+        return
+    leave_room(f'booking_{booking_id}')
@@ -0,0 +1,127 @@
+import math
+
+from sqlalchemy import and_, or_
+
+# Locations are bucketed into a fixed lat/lng grid. Cell ids are laid out row by
+# row, so the cells a bounding box covers in one grid row form a contiguous id
+# range and a viewport query becomes a handful of index range scans.
+CELL_SIZE = 0.01  # degrees, roughly 1.1 km of latitude
+COLS = int(round(360 / CELL_SIZE))
+ROWS = int(round(180 / CELL_SIZE))
+
+# Viewports taller than this many rows are scanned as a single id range instead
+# of one range per row, which keeps the generated SQL small when zoomed out.
+MAX_RANGE_ROWS = 64
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def cell_row(lat):
+    return min(max(int(math.floor((lat + 90) / CELL_SIZE)), 0), ROWS - 1)
+
+
+def cell_col(lng):
+    return min(max(int(math.floor((lng + 180) / CELL_SIZE)), 0), COLS - 1)
+
+
+def geocell(lat, lng):
+    if lat is None or lng is None:
+        return None
+    return cell_row(float(lat)) * COLS + cell_col(float(lng))
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_for_radius(lat, lng, radius_km):
+    # Lat/lng box containing the circle; west > east when it crosses the antimeridian
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    if south == -90.0 or north == 90.0:
+        # The circle covers a pole, so it spans every longitude
+        return south, -180.0, north, 180.0
+
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(max(abs(south), abs(north))))))
+    if dlng >= 180:
+        return south, -180.0, north, 180.0
+    return south, _wrap_lng(lng - dlng), north, _wrap_lng(lng + dlng)
+
+
+def parse_bbox(value):
+    # Expects "south,west,north,east"
+    parts = [float(part) for part in value.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must have four comma-separated numbers")
+    south, west, north, east = parts
+    if south > north:
+        raise ValueError("bbox south edge is above its north edge")
+    if west > east:
+        raise ValueError("bbox west edge is east of its east edge")
+
+    # Map views zoomed far out report bounds past the poles and the antimeridian
+    south, north = max(south, -90.0), min(north, 90.0)
+    if east - west >= 360:
+        west, east = -180.0, 180.0
+    else:
+        west, east = _wrap_lng(west), _wrap_lng(east)
+    return south, west, north, east
+
+
+def _wrap_lng(lng):
+    if -180 <= lng <= 180:
+        return lng
+    return (lng + 180) % 360 - 180
+
+
+def cell_ranges(south, west, north, east):
+    # One (first, last) geocell id range per grid row covered by the box
+    if west > east:
+        # Box crosses the antimeridian: split it into two ordinary boxes
+        return cell_ranges(south, west, north, 180.0) + cell_ranges(south, -180.0, north, east)
+
+    first_row, last_row = cell_row(south), cell_row(north)
+    first_col, last_col = cell_col(west), cell_col(east)
+    if last_row - first_row + 1 > MAX_RANGE_ROWS:
+        return [(first_row * COLS + first_col, last_row * COLS + last_col)]
+    return [(row * COLS + first_col, row * COLS + last_col)
+            for row in range(first_row, last_row + 1)]
+
+
+def within_bbox(model, south, west, north, east):
+    """SQL filter for rows of ``model`` inside the box, driven by ``model.geocell``."""
+    ranges = or_(*[model.geocell.between(first, last)
+                   for first, last in cell_ranges(south, west, north, east)])
+    if west > east:
+        lng_filter = or_(model.lng >= west, model.lng <= east)
+    else:
+        lng_filter = model.lng.between(west, east)
+    return and_(ranges, model.lat.between(south, north), lng_filter)
+
+
+# Farthest any two points on the globe can be apart
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+def nearest(query, model, lat, lng, k, start_radius_km=1.0):
+    """Return up to ``k`` (distance_km, row) pairs from ``query`` closest to the point.
+
+    The search radius grows geometrically and each step is a bounding-box query
+    over the geocell index, so only rows near the point are ever loaded. Once
+    ``k`` rows fall inside the current radius no row outside it can be closer.
+    """
+    radius = start_radius_km
+    while True:
+        box = bbox_for_radius(lat, lng, radius)
+        ranked = sorted(
+            ((haversine_km(lat, lng, row.lat, row.lng), row)
+             for row in query.filter(within_bbox(model, *box))),
+            key=lambda pair: (pair[0], pair[1].id),
+        )
+        within = [pair for pair in ranked if pair[0] <= radius]
+        if len(within) >= k or radius >= MAX_DISTANCE_KM:
+            return within[:k]
+        radius = min(radius * 4, MAX_DISTANCE_KM)
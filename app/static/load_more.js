@@ -0,0 +1,52 @@
+// "Load more" buttons fetch the next page of the same view and move its items
+// into the list named by data-target (prepended when data-position="prepend").
+// An item with a data-group already on the page is merged into that group: its
+// [data-group-items] children join the existing group's instead of repeating it.
+document.addEventListener("click", function (event) {
+    const button = event.target.closest(".load-more");
+    if (!button) {
+        return;
+    }
+    event.preventDefault();
+    button.disabled = true;
+
+    fetch(button.dataset.url)
+        .then(response => response.text())
+        .then(html => {
+            const page = new DOMParser().parseFromString(html, "text/html");
+            const target = document.querySelector(button.dataset.target);
+            const prepend = button.dataset.position === "prepend";
+            const items = Array.from(page.querySelector(button.dataset.target).children).filter(item => {
+                const group = item.dataset.group && target.querySelector(`:scope > [data-group="${item.dataset.group}"]`);
+                if (!group) {
+                    return true;
+                }
+                const children = Array.from(item.querySelector("[data-group-items]").children);
+                const list = group.querySelector("[data-group-items]");
+                if (prepend) {
+                    list.prepend(...children);
+                } else {
+                    list.append(...children);
+                }
+                return false;
+            });
+            if (prepend) {
+                target.prepend(...items);
+            } else {
+                target.append(...items);
+            }
+
+            // Continue from the fetched page's cursor, or stop at the last page
+            const next = page.querySelector(`.load-more[data-target="${button.dataset.target}"]`);
+            if (next) {
+                button.dataset.url = next.dataset.url;
+                button.disabled = false;
+            } else {
+                button.remove();
+            }
+        })
+        .catch(error => {
+            console.error("Error loading more items:", error);
+            button.disabled = false;
+        });
+});
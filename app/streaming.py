@@ -0,0 +1,48 @@
+from flask import Response, current_app, stream_with_context
+
+FORMATS = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _json_array(rows, serialize, batch_size):
+    dumps = current_app.json.dumps
+    chunk = ["["]
+    for i, row in enumerate(rows):
+        if i:
+            chunk.append(",")
+        chunk.append(dumps(serialize(row)))
+        if len(chunk) >= batch_size:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("]")
+    yield "".join(chunk)
+
+
+def _ndjson(rows, serialize, batch_size):
+    dumps = current_app.json.dumps
+    chunk = []
+    for row in rows:
+        chunk.append(dumps(serialize(row)) + "\n")
+        if len(chunk) >= batch_size:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def stream_response(rows, serialize, output_format="json"):
+    """Stream ``rows`` as a JSON array or as NDJSON, one serialized row at a time.
+
+    ``rows`` should be lazy (e.g. ``query.yield_per(...)``) so that neither the
+    ORM objects nor the encoded body are ever held in memory all at once.
+    """
+    if output_format not in FORMATS:
+        raise ValueError(f"Unsupported format {output_format!r}")
+    batch_size = current_app.config["STREAM_BATCH_SIZE"]
+    writer = _ndjson if output_format == "ndjson" else _json_array
+    return Response(
+        stream_with_context(writer(rows, serialize, batch_size)),
+        mimetype=FORMATS[output_format],
+    )
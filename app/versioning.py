@@ -0,0 +1,154 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+
+from flask import Response, current_app, make_response, request
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+
+LOCATIONS = "locations"
+
+
+def tracked_models():
+    # Data sets with a version counter, and the models whose changes bump it
+    from .models import AvailabilityBlock, Location, Reservation
+    return {LOCATIONS: (Location, Reservation, AvailabilityBlock)}
+
+
+def current_version(name):
+    from . import db
+    from .models import DataVersion
+    return db.session.query(DataVersion.version).filter_by(name=name).scalar() or 0
+
+
+def _bump(connection, name):
+    from .models import DataVersion
+    table = DataVersion.__table__
+    result = connection.execute(
+        update(table).where(table.c.name == name).values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(name=name, version=1))
+
+
+def bump_versions(session, flush_context):
+    # Runs inside the flush, so the bump commits or rolls back with the change itself
+    changed = list(chain(session.new, session.deleted))
+    changed += [obj for obj in session.dirty if session.is_modified(obj)]
+    if not changed:
+        return
+
+    for name, models in tracked_models().items():
+        if any(isinstance(obj, models) for obj in changed):
+            _bump(session.connection(), name)
+
+
+def bump_versions_for_bulk(orm_execute_state):
+    # Set-based INSERT/UPDATE/DELETE statements bypass the flush
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = orm_execute_state.statement.table
+    for name, models in tracked_models().items():
+        if any(model.__table__.name == table.name for model in models):
+            _bump(orm_execute_state.session.connection(), name)
+
+
+class VersionedCache:
+    """Strong ETags and an in-process payload cache for read-only JSON endpoints.
+
+    A response is identified by its data set's version plus the request path and
+    query string. A matching ``If-None-Match`` gets ``304 Not Modified`` without
+    running the view; otherwise the body is served from (or stored in) a small
+    LRU so repeated reads of unchanged data skip the query and the encoding.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("VERSIONED_CACHE_SIZE", 128)
+        app.config.setdefault("VERSIONED_CACHE_MAX_BYTES", 4 * 1024 * 1024)
+        app.extensions["versioned_cache"] = {"entries": OrderedDict(), "lock": threading.Lock()}
+        if not event.contains(Session, "after_flush", bump_versions):
+            event.listen(Session, "after_flush", bump_versions)
+        if not event.contains(Session, "do_orm_execute", bump_versions_for_bulk):
+            event.listen(Session, "do_orm_execute", bump_versions_for_bulk)
+
+    def cached(self, name):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                version = current_version(name)
+                key = f"{name}:{version}:{request.full_path}"
+                etag = f"{name}-{version}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+                if request.if_none_match.contains(etag):
+                    response = Response(status=304)
+                else:
+                    response = self._lookup(key)
+                    if response is None:
+                        response = make_response(view(*args, **kwargs))
+                        if response.status_code != 200:
+                            return response
+                        response = self._store(key, response)
+
+                response.set_etag(etag)
+                response.cache_control.no_cache = True
+                return response
+            return wrapper
+        return decorator
+
+    def _lookup(self, key):
+        state = current_app.extensions["versioned_cache"]
+        with state["lock"]:
+            entry = state["entries"].get(key)
+            if entry is None:
+                return None
+            state["entries"].move_to_end(key)
+        body, mimetype = entry
+        return Response(body, mimetype=mimetype)
+
+    def _store(self, key, response):
+        state = current_app.extensions["versioned_cache"]
+        max_entries = current_app.config["VERSIONED_CACHE_SIZE"]
+        max_bytes = current_app.config["VERSIONED_CACHE_MAX_BYTES"]
+        mimetype = response.mimetype
+
+        def put(body):
+            with state["lock"]:
+                state["entries"][key] = (body, mimetype)
+                state["entries"].move_to_end(key)
+                while len(state["entries"]) > max_entries:
+                    state["entries"].popitem(last=False)
+
+        if not response.is_streamed:
+            if response.content_length is not None and response.content_length <= max_bytes:
+                put(response.get_data())
+            return response
+
+        # Keep a copy of a streamed body only while it stays under the size cap,
+        # so large payloads are still streamed with flat memory
+        source = response.response
+
+        def tee():
+            chunks, size = [], 0
+            try:
+                for chunk in source:
+                    if chunks is not None:
+                        data = chunk.encode() if isinstance(chunk, str) else chunk
+                        size += len(data)
+                        if size <= max_bytes:
+                            chunks.append(data)
+                        else:
+                            chunks = None
+                    yield chunk
+            finally:
+                if hasattr(source, "close"):
+                    source.close()
+            if chunks is not None:
+                put(b"".join(chunks))
+
+        response.response = tee()
+        return response
@@ -0,0 +1,65 @@
+import argparse
+import os
+import threading
+import time
+
+from app import create_app, password_hasher
+from app.config import Config
+
+# Logins/sec for each hashing method: on a single hashing thread, and through
+# the hashing pool while many login requests arrive at once. "per core" is the
+# pool rate divided by its worker threads.
+DEFAULT_METHODS = ["pbkdf2:sha256:600000", "pbkdf2:sha256:200000", "scrypt:32768:8:1", "scrypt:16384:8:1"]
+PASSWORD = "correct horse battery staple"
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    SEARCH_BACKEND = "like"
+    PASSWORD_HASH_QUEUE_TIMEOUT = 60
+
+
+def make_app(method, workers):
+    BenchConfig.PASSWORD_HASH_METHOD = method
+    BenchConfig.PASSWORD_HASH_WORKERS = workers
+    return create_app(BenchConfig)
+
+
+def logins_per_second(app, stored, seconds, clients):
+    # ``clients`` request threads each verifying as fast as they can for ``seconds``
+    counts = []
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        count = 0
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                password_hasher.verify(stored, PASSWORD)
+                count += 1
+        counts.append(count)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - started)
+
+
+parser = argparse.ArgumentParser(description="Benchmark password verification throughput.")
+parser.add_argument("methods", nargs="*", default=DEFAULT_METHODS, help="werkzeug hash methods")
+parser.add_argument("--seconds", type=float, default=3.0, help="duration of each measurement")
+parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="hashing threads in the pool")
+parser.add_argument("--clients", type=int, default=32, help="concurrent login requests")
+args = parser.parse_args()
+
+print(f"{args.workers} workers, {args.clients} concurrent logins, {args.seconds:g}s per measurement")
+print(f"{'method':<24} {'1 thread/s':>11} {'pool/s':>9} {'per core/s':>11}")
+for method in args.methods:
+    single_app = make_app(method, 1)
+    with single_app.app_context():
+        stored = password_hasher.hash(PASSWORD)
+    single = logins_per_second(single_app, stored, args.seconds, 1)
+    pooled = logins_per_second(make_app(method, args.workers), stored, args.seconds, args.clients)
+    print(f"{method:<24} {single:>11.1f} {pooled:>9.1f} {pooled / args.workers:>11.1f}")
@@ -0,0 +1,96 @@
+import sys
+from datetime import date
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.config import Config
+from app.models import CarOwner, Renter, Location, Booking, Message, BookingStatus
+
+# Pages that list bookings, with the user type they are rendered for
+PAGES = [
+    ("car_owner", "/dashboard"),
+    ("car_owner", "/requested_booking"),
+    ("car_owner", "/booking_history"),
+    ("renter", "/renter/bookings"),
+    ("renter", "/renter/dashboard"),
+]
+SIZES = [5, 50]
+
+
+class CheckConfig(Config):
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    SEARCH_BACKEND = "like"
+    CACHE_BACKEND = "null"  # measure the queries, not cache hits
+    TESTING = True
+
+
+def seed(booking_count):
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    car_owner = CarOwner(name="Owner", username="owner", email="owner@example.com",
+                         password="x", car_model="Corolla")
+    renter = Renter(name="Renter", username="renter", email="renter@example.com", password="x",
+                    renting_place="Dhaka", price=20, place_type="residential", timing="9am-5pm")
+    db.session.add_all([car_owner, renter])
+    db.session.flush()
+    user_ids = {"car_owner": car_owner.id, "renter": renter.id}
+
+    for i in range(booking_count):
+        # One location per booking so nothing is served from the identity map
+        location = Location(renter_id=renter.id, place_name=f"Spot {i}", address=f"Road {i}",
+                            price=20, lat=23.8, lng=90.4, available=True)
+        db.session.add(location)
+        db.session.flush()
+        booking = Booking(car_owner_id=car_owner.id, renter_id=renter.id, location_id=location.id,
+                          message="", preferred_date=date.today(), contact="0170000000",
+                          status=BookingStatus.Approved)
+        db.session.add(booking)
+        db.session.flush()
+        db.session.add(Message(sender_id=car_owner.id, sender_type="car_owner",
+                               receiver_id=renter.id, receiver_type="renter",
+                               message_content="Hello", booking_id=booking.id))
+    db.session.commit()
+    return user_ids
+
+
+def count_statements(client, url):
+    # Start every page from an empty identity map, as a real request would
+    db.session.remove()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+    if response.status_code != 200:
+        raise RuntimeError(f"{url} returned {response.status_code}")
+    return len(statements)
+
+
+app = create_app(CheckConfig)
+counts = {}
+
+with app.app_context():
+    for size in SIZES:
+        user_ids = seed(size)
+        client = app.test_client()
+        for user_type, url in PAGES:
+            with client.session_transaction() as sess:
+                sess["user_id"] = user_ids[user_type]
+                sess["user_type"] = user_type
+            counts.setdefault(url, []).append(count_statements(client, url))
+
+failed = False
+for url, page_counts in counts.items():
+    constant = len(set(page_counts)) == 1
+    failed = failed or not constant
+    detail = ", ".join(f"{size} bookings: {count}" for size, count in zip(SIZES, page_counts))
+    print(f"{'OK  ' if constant else 'FAIL'} {url} ({detail})")
+
+sys.exit(1 if failed else 0)
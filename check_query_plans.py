@@ -0,0 +1,107 @@
+import sys
+from datetime import date
+
+from sqlalchemy import event
+
+from app import amenities, availability, clustering, create_app, db, spatial
+from app.models import Location, LocationAmenity, LocationCluster, Booking, BookingHistory, InboxSummary, Message, BookingStatus
+
+# A sample user and viewport; the plans do not depend on the values
+USER_ID = 1
+BBOX = (23.70, 90.30, 23.90, 90.50)
+DATES = (date(2026, 11, 1), date(2026, 11, 7))
+AMENITY_MASK = amenities.BITS["covered"] | amenities.BITS["security"]
+
+
+def cluster_query(zoom):
+    # clustering.clusters() without running it
+    first_row, first_col = clustering.cell_of(zoom, BBOX[0], BBOX[1])
+    last_row, last_col = clustering.cell_of(zoom, BBOX[2], BBOX[3])
+    return LocationCluster.query.filter(
+        LocationCluster.level == zoom,
+        LocationCluster.row.between(first_row, last_row),
+        LocationCluster.col.between(first_col, last_col),
+    ).order_by(LocationCluster.row, LocationCluster.col)
+
+
+def hot_queries():
+    # The same query shapes the routes issue, keyed by where they are used
+    approved_booking_ids = db.session.query(Booking.id).filter(
+        (Booking.renter_id == USER_ID) & (Booking.status == BookingStatus.Approved)
+    )
+    return {
+        "dashboard bookings": Booking.listing_query().filter_by(car_owner_id=USER_ID, deleted=False),
+        "requested_booking / booking_history": Booking.listing_query().filter_by(car_owner_id=USER_ID)
+            .order_by(Booking.created_at.desc(), Booking.id.desc()).limit(51),
+        "renter bookings": Booking.listing_query().filter_by(renter_id=USER_ID)
+            .order_by(Booking.created_at.desc(), Booking.id.desc()).limit(51),
+        "renter dashboard locations": Location.query.filter_by(renter_id=USER_ID)
+            .order_by(Location.id).limit(51),
+        "renter dashboard messages": Message.query.filter(
+            (Message.receiver_id == USER_ID) & (Message.receiver_type == "renter") &
+            (Message.booking_id.in_(approved_booking_ids))
+        ).order_by(Message.timestamp.desc(), Message.id.desc()).limit(51),
+        "booking messages": Message.query.filter_by(booking_id=USER_ID)
+            .order_by(Message.timestamp.desc(), Message.id.desc()).limit(51),
+        "booking messages since": Message.query.filter_by(booking_id=USER_ID).filter(Message.id > USER_ID)
+            .order_by(Message.id).limit(51),
+        "locations in bbox": Location.query.filter_by(available=True)
+            .filter(spatial.within_bbox(Location, *BBOX)).order_by(Location.id),
+        "booking history": BookingHistory.for_user("renter", USER_ID)
+            .order_by(BookingHistory.id.desc()).limit(51),
+        "free locations in bbox": Location.query.filter_by(available=True)
+            .filter(spatial.within_bbox(Location, *BBOX), availability.free_between(Location, *DATES))
+            .order_by(Location.id),
+        "inbox": InboxSummary.query.filter_by(user_type="renter", user_id=USER_ID)
+            .order_by(InboxSummary.last_message_at.desc(), InboxSummary.booking_id.desc()).limit(51),
+        "all available locations": Location.query.filter_by(available=True)
+            .order_by(Location.id).limit(51),
+        "locations with amenities": Location.query.filter_by(available=True)
+            .filter(amenities.has_all(Location, AMENITY_MASK)).order_by(Location.id).limit(51),
+        "clusters in bbox": cluster_query(12),
+        "amenity facets in bbox": LocationAmenity.query.with_entities(LocationAmenity.amenity, db.func.count())
+            .filter(LocationAmenity.location_id.in_(
+                db.session.query(Location.id).filter_by(available=True)
+                .filter(spatial.within_bbox(Location, *BBOX)).scalar_subquery()
+            )).group_by(LocationAmenity.amenity),
+    }
+
+
+def full_scans(dialect, plan):
+    if dialect == "sqlite":
+        # Rows are (id, parent, notused, detail); "SCAN t USING ... INDEX" walks an index
+        details = [row[-1] for row in plan]
+        return [d for d in details if d.startswith("SCAN ") and "USING" not in d]
+    return [row[0].strip() for row in plan if "Seq Scan" in row[0]]
+
+
+app = create_app()
+
+with app.app_context():
+    dialect = db.engine.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    plans = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            cursor.execute(prefix + statement, parameters)
+            plans.append(cursor.fetchall())
+
+    if dialect == "postgresql":
+        # Small tables are cheaper to scan; make the planner prove it could use an index
+        db.session.execute(db.text("SET enable_seqscan = off"))
+
+    failed = False
+    for name, query in hot_queries().items():
+        plans.clear()
+        event.listen(db.engine, "before_cursor_execute", explain)
+        try:
+            query.all()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", explain)
+        scans = [scan for plan in plans for scan in full_scans(dialect, plan)]
+        failed = failed or bool(scans)
+        print(f"{'FAIL' if scans else 'OK  '} {name}" + "".join(f"\n     {scan}" for scan in scans))
+    db.session.rollback()
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,50 @@
+"""Add indexes for hot filter columns
+
+Revision ID: 271112043813
+Revises: c92ceefa1920
+Create Date: 2026-10-18 09:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '271112043813'
+down_revision = 'c92ceefa1920'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('location', schema=None) as batch_op:
+        batch_op.create_index('ix_location_renter_id', ['renter_id'], unique=False)
+        batch_op.create_index('ix_location_available_geocell', ['available', 'geocell'], unique=False)
+        batch_op.create_index('ix_location_available_id', ['available', 'id'], unique=False)
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index('ix_booking_car_owner_id_deleted', ['car_owner_id', 'deleted'], unique=False)
+        batch_op.create_index('ix_booking_car_owner_id_created_at', ['car_owner_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_booking_renter_id_created_at', ['renter_id', 'created_at', 'id'], unique=False)
+        batch_op.create_index('ix_booking_renter_id_status', ['renter_id', 'status'], unique=False)
+
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.create_index('ix_message_booking_id_timestamp', ['booking_id', 'timestamp', 'id'], unique=False)
+        batch_op.create_index('ix_message_receiver_timestamp', ['receiver_id', 'receiver_type', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_index('ix_message_receiver_timestamp')
+        batch_op.drop_index('ix_message_booking_id_timestamp')
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_renter_id_status')
+        batch_op.drop_index('ix_booking_renter_id_created_at')
+        batch_op.drop_index('ix_booking_car_owner_id_created_at')
+        batch_op.drop_index('ix_booking_car_owner_id_deleted')
+
+    with op.batch_alter_table('location', schema=None) as batch_op:
+        batch_op.drop_index('ix_location_available_id')
+        batch_op.drop_index('ix_location_available_geocell')
+        batch_op.drop_index('ix_location_renter_id')
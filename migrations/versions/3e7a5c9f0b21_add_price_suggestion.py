@@ -0,0 +1,33 @@
+"""Add suggested prices
+
+Revision ID: 3e7a5c9f0b21
+Revises: 9b3f6c1d2e48
+Create Date: 2026-10-18 15:50:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e7a5c9f0b21'
+down_revision = '9b3f6c1d2e48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('price_suggestion',
+        sa.Column('location_id', sa.Integer(), nullable=False),
+        sa.Column('base_price', sa.Float(), nullable=False),
+        sa.Column('suggested_price', sa.Float(), nullable=False),
+        sa.Column('demand', sa.Float(), nullable=False),
+        sa.Column('occupancy', sa.Float(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['location_id'], ['location.id'], name='fk_price_suggestion_location_id', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('location_id')
+    )
+
+
+def downgrade():
+    op.drop_table('price_suggestion')
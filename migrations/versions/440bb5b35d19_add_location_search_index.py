@@ -0,0 +1,46 @@
+"""Add full-text search index for locations
+
+Revision ID: 440bb5b35d19
+Revises: 87fe5c280d41
+Create Date: 2026-10-18 07:40:00.000000
+
+SQLite gets an FTS5 table mirrored from location (kept up to date by the model
+events in app/search.py); Postgres gets a GIN index over the tsvector
+expression used by PostgresBackend.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '440bb5b35d19'
+down_revision = '87fe5c280d41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE location_fts USING fts5("
+            "place_name, address, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "INSERT INTO location_fts (rowid, place_name, address) "
+            "SELECT id, place_name, address FROM location"
+        )
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE INDEX ix_location_search ON location USING gin ("
+            "to_tsvector('simple', coalesce(place_name, '') || ' ' || coalesce(address, '')))"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute("DROP TABLE location_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX ix_location_search")
@@ -0,0 +1,89 @@
+"""Add amenity bitmask and location_amenity facet table
+
+Revision ID: 5d0e8a2b7c13
+Revises: c7a81fdad6c0
+Create Date: 2026-10-18 14:30:00.000000
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0e8a2b7c13'
+down_revision = 'c7a81fdad6c0'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the vocabulary in app/amenities.py at the time of this revision
+BITS = {
+    'security': 1 << 0, 'lighting': 1 << 1, 'covered': 1 << 2, 'cctv': 1 << 3,
+    'ev_charging': 1 << 4, 'gated': 1 << 5, 'accessible': 1 << 6, 'open_24h': 1 << 7,
+}
+ALIASES = {
+    'security': 'security', 'security guard': 'security', 'guard': 'security', 'guarded': 'security',
+    'lighting': 'lighting', 'lights': 'lighting', 'lit': 'lighting', 'well lit': 'lighting',
+    'covered': 'covered', 'roof': 'covered', 'roofed': 'covered', 'indoor': 'covered', 'garage': 'covered',
+    'cctv': 'cctv', 'camera': 'cctv', 'cameras': 'cctv', 'surveillance': 'cctv',
+    'ev charging': 'ev_charging', 'ev charger': 'ev_charging', 'ev': 'ev_charging', 'charging': 'ev_charging',
+    'gated': 'gated', 'gate': 'gated',
+    'accessible': 'accessible', 'wheelchair access': 'accessible', 'disabled access': 'accessible',
+    'open 24 hours': 'open_24h', '24 hours': 'open_24h', '24h': 'open_24h', '24/7': 'open_24h', '24x7': 'open_24h',
+}
+
+
+def _keys(text):
+    keys = set()
+    for raw in re.split(r'[,;|\n]+', text or ''):
+        key = ALIASES.get(' '.join(re.sub(r'[_\-]+', ' ', raw).lower().split()))
+        if key:
+            keys.add(key)
+    return keys
+
+
+def _mask(keys):
+    return sum(BITS[key] for key in keys)
+
+
+def upgrade():
+    for table in ('renter', 'location'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('amenity_mask', sa.Integer(), server_default='0', nullable=False))
+
+    location_amenity = op.create_table('location_amenity',
+        sa.Column('location_id', sa.Integer(), nullable=False),
+        sa.Column('amenity', sa.String(length=30), nullable=False),
+        sa.ForeignKeyConstraint(['location_id'], ['location.id'], name='fk_location_amenity_location_id', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('location_id', 'amenity')
+    )
+    with op.batch_alter_table('location_amenity', schema=None) as batch_op:
+        batch_op.create_index('ix_location_amenity_amenity', ['amenity', 'location_id'], unique=False)
+
+    # Parse the existing free-form strings; they are rewritten in normalized
+    # form the next time each row is saved
+    bind = op.get_bind()
+    facet_rows = []
+    for table in ('renter', 'location'):
+        rows = bind.execute(sa.text(f"SELECT id, amenities FROM {table} WHERE amenities IS NOT NULL")).fetchall()
+        for row_id, text in rows:
+            keys = _keys(text)
+            if not keys:
+                continue
+            bind.execute(sa.text(f"UPDATE {table} SET amenity_mask = :mask WHERE id = :id"),
+                         {'mask': _mask(keys), 'id': row_id})
+            if table == 'location':
+                facet_rows += [{'location_id': row_id, 'amenity': key} for key in sorted(keys)]
+    if facet_rows:
+        op.bulk_insert(location_amenity, facet_rows)
+
+
+def downgrade():
+    with op.batch_alter_table('location_amenity', schema=None) as batch_op:
+        batch_op.drop_index('ix_location_amenity_amenity')
+
+    op.drop_table('location_amenity')
+    for table in ('location', 'renter'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('amenity_mask')
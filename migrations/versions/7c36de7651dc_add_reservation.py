@@ -0,0 +1,49 @@
+"""Add per-date reservations
+
+Revision ID: 7c36de7651dc
+Revises: ad6477d4f714
+Create Date: 2026-10-18 11:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c36de7651dc'
+down_revision = 'ad6477d4f714'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reservation',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('location_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], name='fk_reservation_booking_id', ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['location_id'], ['location.id'], name='fk_reservation_location_id'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('booking_id'),
+        sa.UniqueConstraint('location_id', 'date', name='uq_reservation_location_date')
+    )
+
+    # Existing live bookings claim their dates; where a slot was already
+    # double-booked the earliest request keeps it
+    booking = sa.table('booking',
+        sa.column('id', sa.Integer), sa.column('location_id', sa.Integer),
+        sa.column('preferred_date', sa.Date), sa.column('status', sa.String),
+        sa.column('deleted', sa.Boolean))
+    reservation = sa.table('reservation',
+        sa.column('location_id', sa.Integer), sa.column('date', sa.Date), sa.column('booking_id', sa.Integer))
+    winners = sa.select(booking.c.location_id, booking.c.preferred_date, sa.func.min(booking.c.id)).where(
+        booking.c.location_id.isnot(None),
+        booking.c.deleted == sa.false(),
+        booking.c.status != 'Rejected',
+    ).group_by(booking.c.location_id, booking.c.preferred_date)
+    op.execute(reservation.insert().from_select(['location_id', 'date', 'booking_id'], winners))
+
+
+def downgrade():
+    op.drop_table('reservation')
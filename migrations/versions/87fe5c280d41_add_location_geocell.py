@@ -0,0 +1,54 @@
+"""Add spatial grid bucket to location
+
+Revision ID: 87fe5c280d41
+Revises:
+Create Date: 2026-10-18 07:10:00.000000
+
+Databases stamped with an older revision that is no longer in this directory
+should be cleared with reset_alembic.py before upgrading.
+
+"""
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '87fe5c280d41'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the grid layout in app/spatial.py at the time of this revision
+CELL_SIZE = 0.01
+COLS = 36000
+ROWS = 18000
+
+
+def _geocell(lat, lng):
+    row = min(max(int(math.floor((lat + 90) / CELL_SIZE)), 0), ROWS - 1)
+    col = min(max(int(math.floor((lng + 180) / CELL_SIZE)), 0), COLS - 1)
+    return row * COLS + col
+
+
+def upgrade():
+    with op.batch_alter_table('location', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geocell', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_location_geocell'), ['geocell'], unique=False)
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT id, lat, lng FROM location WHERE lat IS NOT NULL AND lng IS NOT NULL"
+    )).fetchall()
+    for location_id, lat, lng in rows:
+        bind.execute(
+            sa.text("UPDATE location SET geocell = :geocell WHERE id = :id"),
+            {"geocell": _geocell(lat, lng), "id": location_id},
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('location', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_location_geocell'))
+        batch_op.drop_column('geocell')
@@ -0,0 +1,66 @@
+"""Add location clusters per map zoom level
+
+Revision ID: 9b3f6c1d2e48
+Revises: 5d0e8a2b7c13
+Create Date: 2026-10-18 15:10:00.000000
+
+"""
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3f6c1d2e48'
+down_revision = '5d0e8a2b7c13'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of the cluster grid in app/clustering.py at the time of this revision
+MIN_ZOOM = 0
+MAX_ZOOM = 16
+
+
+def _cell(zoom, lat, lng):
+    size = 360.0 / (2 ** zoom) * 64 / 256
+    rows, cols = int(round(180 / size)), int(round(360 / size))
+    row = min(max(int(math.floor((lat + 90) / size)), 0), rows - 1)
+    col = min(max(int(math.floor((lng + 180) / size)), 0), cols - 1)
+    return row, col
+
+
+def upgrade():
+    location_cluster = op.create_table('location_cluster',
+        sa.Column('level', sa.SmallInteger(), nullable=False),
+        sa.Column('row', sa.Integer(), nullable=False),
+        sa.Column('col', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.Column('lat_sum', sa.Float(), nullable=False),
+        sa.Column('lng_sum', sa.Float(), nullable=False),
+        sa.Column('min_price', sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint('level', 'row', 'col')
+    )
+
+    cells = {}
+    rows = op.get_bind().execute(sa.text(
+        "SELECT lat, lng, price FROM location WHERE available = 1 AND lat IS NOT NULL AND lng IS NOT NULL"
+    ))
+    for lat, lng, price in rows:
+        price = float(price or 0)
+        for zoom in range(MIN_ZOOM, MAX_ZOOM + 1):
+            cell = cells.setdefault((zoom,) + _cell(zoom, lat, lng), [0, 0.0, 0.0, price])
+            cell[0] += 1
+            cell[1] += lat
+            cell[2] += lng
+            cell[3] = min(cell[3], price)
+    if cells:
+        op.bulk_insert(location_cluster, [
+            {'level': zoom, 'row': row, 'col': col, 'count': count,
+             'lat_sum': lat_sum, 'lng_sum': lng_sum, 'min_price': min_price}
+            for (zoom, row, col), (count, lat_sum, lng_sum, min_price) in cells.items()
+        ])
+
+
+def downgrade():
+    op.drop_table('location_cluster')
@@ -0,0 +1,98 @@
+"""Move booking history from JSON columns to a table
+
+Revision ID: ad6477d4f714
+Revises: 271112043813
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ad6477d4f714'
+down_revision = '271112043813'
+branch_labels = None
+depends_on = None
+
+USER_TABLES = {'car_owner': 'car_owner', 'renter': 'renter'}
+
+
+def _user_table(name):
+    return sa.table(name, sa.column('id', sa.Integer), sa.column('history', sa.JSON))
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def upgrade():
+    booking_history = op.create_table('booking_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_type', sa.String(length=20), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=True),
+        sa.Column('location', sa.String(length=100), nullable=True),
+        sa.Column('preferred_date', sa.Date(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('booking_history', schema=None) as batch_op:
+        batch_op.create_index('ix_booking_history_user', ['user_type', 'user_id', 'id'], unique=False)
+
+    # Copy each user's JSON list in order, so ids keep the original sequence
+    connection = op.get_bind()
+    for user_type, table_name in USER_TABLES.items():
+        users = _user_table(table_name)
+        rows = []
+        for user_id, history in connection.execute(
+                sa.select(users.c.id, users.c.history).where(users.c.history.isnot(None)).order_by(users.c.id)):
+            for entry in history or []:
+                rows.append({
+                    'user_type': user_type,
+                    'user_id': user_id,
+                    'booking_id': None,
+                    'location': entry.get('location'),
+                    'preferred_date': _parse_date(entry.get('preferred_date')),
+                    'status': entry.get('status') or 'Approved',
+                    'created_at': None,
+                })
+        if rows:
+            op.bulk_insert(booking_history, rows)
+
+    for table_name in USER_TABLES.values():
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_column('history')
+
+
+def downgrade():
+    for table_name in USER_TABLES.values():
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('history', sa.JSON(), nullable=True))
+
+    booking_history = sa.table('booking_history',
+        sa.column('id', sa.Integer), sa.column('user_type', sa.String), sa.column('user_id', sa.Integer),
+        sa.column('location', sa.String), sa.column('preferred_date', sa.Date), sa.column('status', sa.String))
+    connection = op.get_bind()
+    histories = {}
+    for entry in connection.execute(sa.select(booking_history).order_by(booking_history.c.id)):
+        histories.setdefault((entry.user_type, entry.user_id), []).append({
+            'location': entry.location,
+            'preferred_date': entry.preferred_date.isoformat() if entry.preferred_date else None,
+            'status': entry.status,
+        })
+    for (user_type, user_id), history in histories.items():
+        users = _user_table(USER_TABLES[user_type])
+        connection.execute(users.update().where(users.c.id == user_id).values(history=history))
+
+    with op.batch_alter_table('booking_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_history_user')
+
+    op.drop_table('booking_history')
@@ -0,0 +1,36 @@
+"""Add availability blocks
+
+Revision ID: c2be63d9c499
+Revises: 7c36de7651dc
+Create Date: 2026-10-18 11:45:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2be63d9c499'
+down_revision = '7c36de7651dc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('availability_block',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('location_id', sa.Integer(), nullable=False),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(['location_id'], ['location.id'], name='fk_availability_block_location_id'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('availability_block', schema=None) as batch_op:
+        batch_op.create_index('ix_availability_block_location', ['location_id', 'start_date', 'end_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('availability_block', schema=None) as batch_op:
+        batch_op.drop_index('ix_availability_block_location')
+
+    op.drop_table('availability_block')
@@ -0,0 +1,61 @@
+"""Add inbox summaries
+
+Revision ID: c7a81fdad6c0
+Revises: f1b24f61407f
+Create Date: 2026-10-18 13:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a81fdad6c0'
+down_revision = 'f1b24f61407f'
+branch_labels = None
+depends_on = None
+
+PREVIEW_LENGTH = 200
+
+
+def upgrade():
+    inbox_summary = op.create_table('inbox_summary',
+        sa.Column('user_type', sa.String(length=20), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('booking_id', sa.Integer(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('last_message_preview', sa.String(length=200), nullable=True),
+        sa.Column('last_sender_type', sa.String(length=20), nullable=True),
+        sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], name='fk_inbox_summary_booking_id', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_type', 'user_id', 'booking_id')
+    )
+    with op.batch_alter_table('inbox_summary', schema=None) as batch_op:
+        batch_op.create_index('ix_inbox_summary_user', ['user_type', 'user_id', 'last_message_at', 'booking_id'], unique=False)
+
+    # Fold the existing messages, oldest first, into one summary per participant and booking
+    message = sa.table('message',
+        sa.column('id', sa.Integer), sa.column('sender_id', sa.Integer), sa.column('sender_type', sa.String),
+        sa.column('receiver_id', sa.Integer), sa.column('receiver_type', sa.String),
+        sa.column('message_content', sa.Text), sa.column('timestamp', sa.DateTime),
+        sa.column('booking_id', sa.Integer), sa.column('read_status', sa.Boolean))
+    summaries = {}
+    for row in op.get_bind().execute(sa.select(message).order_by(message.c.timestamp, message.c.id)):
+        for user_type, user_id, unread in ((row.receiver_type, row.receiver_id, 0 if row.read_status else 1),
+                                           (row.sender_type, row.sender_id, 0)):
+            summary = summaries.setdefault((user_type, user_id, row.booking_id), {
+                'user_type': user_type, 'user_id': user_id, 'booking_id': row.booking_id, 'unread_count': 0,
+            })
+            summary['unread_count'] += unread
+            summary['last_message_at'] = row.timestamp
+            summary['last_message_preview'] = (row.message_content or '')[:PREVIEW_LENGTH]
+            summary['last_sender_type'] = row.sender_type
+    if summaries:
+        op.bulk_insert(inbox_summary, list(summaries.values()))
+
+
+def downgrade():
+    with op.batch_alter_table('inbox_summary', schema=None) as batch_op:
+        batch_op.drop_index('ix_inbox_summary_user')
+
+    op.drop_table('inbox_summary')
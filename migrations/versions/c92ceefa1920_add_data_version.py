@@ -0,0 +1,29 @@
+"""Add data version counters
+
+Revision ID: c92ceefa1920
+Revises: fbf10e52af5a
+Create Date: 2026-10-18 08:55:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c92ceefa1920'
+down_revision = 'fbf10e52af5a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    data_version = op.create_table('data_version',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(data_version, [{'name': 'locations', 'version': 1}])
+
+
+def downgrade():
+    op.drop_table('data_version')
@@ -0,0 +1,26 @@
+"""Add an index for message sync by id
+
+Revision ID: e4b9d2a6c815
+Revises: 3e7a5c9f0b21
+Create Date: 2026-10-18 17:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b9d2a6c815'
+down_revision = '3e7a5c9f0b21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.create_index('ix_message_booking_id_id', ['booking_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_index('ix_message_booking_id_id')
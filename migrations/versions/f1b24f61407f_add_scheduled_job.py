@@ -0,0 +1,39 @@
+"""Add scheduled job store and booking expiry index
+
+Revision ID: f1b24f61407f
+Revises: c2be63d9c499
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1b24f61407f'
+down_revision = 'c2be63d9c499'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('scheduled_job',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('next_run_at', sa.DateTime(), nullable=True),
+        sa.Column('last_started_at', sa.DateTime(), nullable=True),
+        sa.Column('last_duration_ms', sa.Float(), nullable=True),
+        sa.Column('last_rows', sa.Integer(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('run_count', sa.Integer(), nullable=False),
+        sa.Column('total_rows', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index('ix_booking_status_preferred_date', ['status', 'preferred_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_status_preferred_date')
+
+    op.drop_table('scheduled_job')
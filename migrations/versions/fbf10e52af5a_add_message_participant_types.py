@@ -0,0 +1,55 @@
+"""Add participant types to message
+
+Revision ID: fbf10e52af5a
+Revises: 440bb5b35d19
+Create Date: 2026-10-18 08:05:00.000000
+
+Existing rows are classified through their booking: a sender id that matches
+only the booking's car owner (or only its renter) is unambiguous. When both
+sides share the same numeric id the old rule applies and the sender is taken
+to be the car owner. The receiver is always the other side of the booking.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fbf10e52af5a'
+down_revision = '440bb5b35d19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sender_type', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('receiver_type', sa.String(length=20), nullable=True))
+
+    op.execute("""
+        UPDATE message SET sender_type = (
+            SELECT CASE
+                WHEN message.sender_id = booking.renter_id
+                     AND message.sender_id != booking.car_owner_id THEN 'renter'
+                WHEN message.sender_id = booking.car_owner_id THEN 'car_owner'
+                WHEN message.sender_id IN (SELECT id FROM car_owner) THEN 'car_owner'
+                ELSE 'renter'
+            END
+            FROM booking WHERE booking.id = message.booking_id
+        )
+    """)
+    op.execute("UPDATE message SET sender_type = 'car_owner' WHERE sender_type IS NULL")
+    op.execute("""
+        UPDATE message SET receiver_type =
+            CASE WHEN sender_type = 'car_owner' THEN 'renter' ELSE 'car_owner' END
+    """)
+
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.alter_column('sender_type', existing_type=sa.String(length=20), nullable=False)
+        batch_op.alter_column('receiver_type', existing_type=sa.String(length=20), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('message', schema=None) as batch_op:
+        batch_op.drop_column('receiver_type')
+        batch_op.drop_column('sender_type')
@@ -1,6 +1,7 @@
-from app import create_app
+from app import create_app, scheduler, socketio
 
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    scheduler.start(app)
+    socketio.run(app, debug=True)